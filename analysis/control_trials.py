@@ -1,11 +1,11 @@
-from pylab import np, plt
+import numpy as np
 from os import makedirs
 
 from utils.utils import log
-from data_management.data_manager import import_data
 
 from analysis.parameters import parameters
-from analysis.tools.backup import Backup
+from analysis.tools.cache import cached_import_data
+from analysis.tools.plotting import FigureJob, Plotter
 
 
 """
@@ -30,11 +30,9 @@ class Analyst:
 
     name = "Analyst 'control trials'"
 
-    def __init__(self, data, fig_name="figure.pdf", monkey=""):
+    def __init__(self, data):
 
         self.data = data
-        self.fig_name = fig_name
-        self.monkey = monkey
 
         self.sorted_data = None
         self.results = None
@@ -181,9 +179,27 @@ class Analyst:
             log("Std: {}".format(np.std(n_trials)), self.name)
             log("Sum: {}".format(np.sum(n_trials)), self.name)
 
-    def plot(self):
+    def run(self):
+
+        self.sort_data()
+        self.get_results()
+
+        return self.results
+
+
+class Plot(object):
+
+    control_conditions = Analyst.control_conditions
 
-        fig, ax = plt.subplots()
+    def __init__(self, results, monkey, fig_name):
+
+        self.results = results
+        self.monkey = monkey
+        self.fig_name = fig_name
+
+    def draw(self, fig):
+
+        ax = fig.add_subplot(111)
 
         n = len(self.control_conditions)
 
@@ -217,11 +233,13 @@ class Analyst:
 
         ax.scatter(x_scatter, y_scatter, c=colors_scatter, s=30, alpha=1, linewidth=0.0, zorder=2)
 
-        plt.xticks(positions, names, fontsize=fontsize)
-        plt.xlabel("Type of control\nMonkey {}.".format(self.monkey[0]), fontsize=fontsize)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(names, fontsize=fontsize)
+        ax.set_xlabel("Type of control\nMonkey {}.".format(self.monkey[0]), fontsize=fontsize)
 
-        plt.yticks(np.arange(0.4, 1.1, 0.2), fontsize=fontsize)
-        plt.ylabel("Success rate", fontsize=fontsize)
+        ax.set_yticks(np.arange(0.4, 1.1, 0.2))
+        ax.tick_params(axis='y', labelsize=fontsize)
+        ax.set_ylabel("Success rate", fontsize=fontsize)
         ax.set_ylim(0.35, 1.02)
 
         # Boxplot
@@ -236,44 +254,38 @@ class Analyst:
                 b.set_alpha(0.5)
 
         ax.set_aspect(3)
-        # plt.legend()
 
-        plt.tight_layout()
+        fig.tight_layout()
 
-        plt.savefig(fname=self.fig_name)
-        plt.close()
+    def job(self):
 
-    def run(self):
-
-        self.sort_data()
-        self.get_results()
-        self.plot()
+        return FigureJob(draw=self.draw, fig_name=self.fig_name)
 
 
 def main(force=False):
 
     makedirs(parameters.folders["figures"], exist_ok=True)
 
+    jobs = []
+
     for monkey in ["Havane", "Gladys"]:
 
         log(monkey, name="control_trials.__main__")
 
         starting_point = parameters.starting_points[monkey]
 
-        b = Backup(monkey, kind_of_analysis="data", folder=parameters.folders["pickle"])
-        data = b.load()
+        data = cached_import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point,
+                                  database_path=parameters.database_path, force=force)
 
         fig_name = "{}/{}_{}.pdf" \
             .format(parameters.folders["figures"], monkey, get_script_name())
 
-        if force is True or data is None:
+        analyst = Analyst(data=data)
+        results = analyst.run()
 
-            data = import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point,
-                               database_path=parameters.database_path)
-            b.save(data)
+        jobs.append(Plot(results=results, monkey=monkey, fig_name=fig_name).job())
 
-        analyst = Analyst(data=data, fig_name=fig_name, monkey=monkey)
-        analyst.run()
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
@@ -2,11 +2,9 @@ from pylab import np, plt
 from scipy.stats import sem
 from os import makedirs
 
-from data_management.data_manager import import_data
-
 from utils.utils import log
 
-from analysis.tools.backup import Backup
+from analysis.tools.cache import Cache, cached_import_data
 
 from analysis.parameters.parameters import folders, starting_points, end_point
 
@@ -254,26 +252,22 @@ class PlotByPairs(object):
         plt.close()
 
 
-def main(make_only_figures=True):
+def main(force=False):
 
     makedirs(folders["figures"], exist_ok=True)
 
+    cache = Cache()
+
     for monkey in ["Havane", "Gladys"]:
 
         print("\nAnalysis for {}...".format(monkey))
 
         starting_point = starting_points[monkey]
 
-        b = Backup(monkey, "equalExpectedValue")
-        sorted_data = b.load()
-
-        if not make_only_figures or sorted_data is None:
-
-            data = import_data(monkey=monkey, starting_point=starting_point, end_point=end_point)
-            analyst = Analyst(data=data)
-            sorted_data = analyst.get_sorted_data()
+        data = cached_import_data(monkey=monkey, starting_point=starting_point, end_point=end_point, cache=cache)
 
-            b.save(sorted_data)
+        key = cache.key("{}_equal_expected_value".format(monkey), code=(__file__, ), data=data)
+        sorted_data = cache.get(key, lambda: Analyst(data=data).get_sorted_data(), force=force)
 
         results1 = Analyst.analyse_pooled_four_categories(sorted_data)
         results2 = Analyst.analyse_by_pairs_of_lotteries(sorted_data)
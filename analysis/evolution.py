@@ -1,20 +1,20 @@
 from os import makedirs
-from pylab import np, plt
+import numpy as np
 import itertools as it
 from tqdm import tqdm
 from multiprocessing import Pool, cpu_count
 
 from scipy.signal import savgol_filter
 
-from data_management.data_manager import import_data
 from analysis.tools.data_sorter import sort_data
 
-from analysis.tools.backup import Backup
+from analysis.tools.cache import Cache, cached_import_data
+from analysis.tools.plotting import FigureJob, Plotter
 from analysis.modelling import AlternativesNKGetter, ModelRunner, LlsComputer, ProspectTheoryModel
 from analysis.parameters.parameters import \
     folders, range_parameters, n_values_per_parameter
 
-from utils.utils import log
+from utils.utils import log, today
 
 """
 Supp: assess the evolution of 'best' parameters over time
@@ -111,17 +111,24 @@ class Plot:
     bbox_to_anchor = (1, 0.5)
     loc = 'center left'
 
-    @classmethod
-    def plot(cls, monkey, data, name, cond, smooth=True):
+    def __init__(self, monkey, data, name, cond, smooth=True):
 
         makedirs(folders["figures"], exist_ok=True)
 
-        plt.figure(figsize=cls.fig_size)
-        ax = plt.subplot(111)
+        self.monkey = monkey
+        self.data = data
+        self.cond = cond
+        self.smooth = smooth
 
-        fig_name = "{}/{}_{}.pdf" \
+        self.fig_name = "{}/{}_{}.pdf" \
             .format(folders["figures"], monkey, name)
 
+    def draw(self, fig):
+
+        ax = fig.add_subplot(111)
+
+        monkey, data, cond, smooth = self.monkey, self.data, self.cond, self.smooth
+
         x = np.arange(data["n_group"])
 
         for key in sorted(ProspectTheoryModel.labels):
@@ -156,21 +163,23 @@ class Plot:
             ax.set_xlabel(cond.replace("_", " ").capitalize())
 
         elif cond == "beginning_vs_end":
-            plt.xticks((0, 1), ("Beginning", "End"))
-            plt.xlabel("Session")
+            ax.set_xticks((0, 1))
+            ax.set_xticklabels(("Beginning", "End"))
+            ax.set_xlabel("Session")
 
         ax.set_ylabel("Parameter value")
         ax.set_ylim((-1, 1))
 
         box = ax.get_position()
         ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
-        ax.legend(loc=cls.loc, bbox_to_anchor=cls.bbox_to_anchor)
+        ax.legend(loc=self.loc, bbox_to_anchor=self.bbox_to_anchor)
+
+    def job(self):
 
-        plt.savefig(filename=fig_name)
-        plt.close()
+        return FigureJob(draw=self.draw, fig_name=self.fig_name, fig_size=self.fig_size)
 
 
-def main(just_do_graphs=True):
+def main(force=False):
 
     # For supplementary analysis, where to
     condition_evolution = "pool"  # Choice: "day", "beginning_vs_end", "pool"
@@ -179,28 +188,28 @@ def main(just_do_graphs=True):
 
     starting_point = "2016-12-01"
 
-    for monkey in ["Havane", "Gladys"]:
+    cache = Cache()
 
-        b = Backup(monkey=monkey, kind_of_analysis=kind_of_analysis)
+    jobs = []
 
-        if just_do_graphs:
-            results = b.load()
-        else:
-            results = None
+    for monkey in ["Havane", "Gladys"]:
+
+        data = cached_import_data(monkey=monkey, starting_point=starting_point, end_point=today(), cache=cache)
 
-        if results is None:
+        def analyse():
 
-            # Get data and sort it
-            data = import_data(monkey=monkey, starting_point=starting_point)
+            # Sort data and fit each group
             sorted_data = sort_data(data=data, sort_type=condition_evolution)
+            analyst = Analyst(sorted_data=sorted_data, n_dates=len(data["session"]))
+            return analyst.run()
 
-            analyst = Analyst(sorted_data=sorted_data, n_dates=len(data["session"]), monkey=monkey)
+        key = cache.key("{}_{}".format(monkey, kind_of_analysis), code=(__file__, ), data=data)
+        results = cache.get(key, analyse, force=force)
 
-            results = analyst.run()
-            b.save(data=results)
+        p = Plot(monkey=monkey, data=results, name=kind_of_analysis, cond=condition_evolution)
+        jobs.append(p.job())
 
-        p = Plot()
-        p.plot(monkey=monkey, data=results, name=kind_of_analysis, cond=condition_evolution)
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,11 @@
-from pylab import np, plt
+import numpy as np
 from os import makedirs
-import pandas as pd
-from scipy import stats
-
-from data_management.data_manager import import_data
 
 from utils.utils import log
 
-from analysis.tools.backup import Backup
+from analysis.tools.cache import cached_import_data
+from analysis.tools.plotting import FigureJob, Plotter
+from analysis.tools.contingency import chi_square_test, permutation_test
 from analysis.parameters import parameters
 
 
@@ -127,10 +125,10 @@ class Analyst:
         # For plot
         results = {}
 
-        # For Chi2
-        data_frames = dict()
+        # For statistics: (misses, hits) for every condition
+        counts = np.zeros((len(conditions), 2), dtype=int)
 
-        for c in conditions:
+        for i, c in enumerate(conditions):
 
             pairs = list(sorted_data[c].keys())
             log("For condition {}, I got {} pair(s) of lotteries ({}).".format(c, len(pairs), pairs), name=self.name)
@@ -139,41 +137,42 @@ class Analyst:
 
             chosen = sorted_data[c][pairs[0]]
 
-            mean = np.mean(chosen)
             n = len(chosen)
-            results[c] = mean
-
-            log("Observed freq is {:.2f} ({} trials)".format(mean, n), self.name)
-
-            # For Chi2
-            n_hit = np.sum(chosen)
+            n_hit = int(np.sum(chosen))
+            results[c] = n_hit / n
 
-            data_frames[c] = pd.DataFrame(["yes"] * n_hit + ["no"] * (n - n_hit))
-            data_frames[c] = pd.crosstab(index=data_frames[c][0], columns="count")
+            log("Observed freq is {:.2f} ({} trials)".format(results[c], n), self.name)
 
-        # log(data_frames)
+            counts[i] = n - n_hit, n_hit
 
-        first_sample = data_frames["gains"]
-        second_sample = data_frames["losses"]
+        return results, counts
 
-        observed = first_sample
-        expected = second_sample/len(second_sample) * len(first_sample)
 
-        chi_squared_stat = (((observed - expected) ** 2) / expected).sum()
+def compare_gains_and_losses(counts, n_permutations=10000):
 
-        log("Chi squared stat: {}".format(chi_squared_stat["count"]), self.name)
+    """
+    Compare the proportion of risky choices in the gains condition with the one in the losses condition
+    :param counts: dictionary giving for every monkey an array of counts (gains, losses) x (misses, hits)
+    """
 
-        crit = stats.chi2.ppf(q=0.95,  # Find the critical value for 95% confidence*
-                              df=1)  # Df = number of variable categories - 1
+    monkeys = sorted(counts.keys())
+    tables = np.array([counts[monkey] for monkey in monkeys])
 
-        log("Critical value: {}".format(crit), self.name)
+    # Counts in the gains condition are compared to the ones expected from the proportions observed
+    # in the losses condition, scaled to the number of trials of the gains condition
+    observed = tables[:, 0]
+    expected = tables[:, 1] / tables[:, 1].sum(axis=-1, keepdims=True) * observed.sum(axis=-1, keepdims=True)
 
-        p_value = 1 - stats.chi2.cdf(x=chi_squared_stat,  # Find the p-value
-                                     df=1)
+    chi_squared_stat, crit, p_value = chi_square_test(observed=observed, expected=expected, df=1)
+    permutation_p_value = permutation_test(tables, n_permutations=n_permutations)
 
-        log("P value: {}".format(p_value[0]), self.name)
+    for i, monkey in enumerate(monkeys):
 
-        return results
+        name = "exemplary_case.{}".format(monkey)
+        log("Chi squared stat: {}".format(chi_squared_stat[i]), name)
+        log("Critical value: {}".format(crit), name)
+        log("P value: {}".format(p_value[i]), name)
+        log("Permutation test ({} resamples) P value: {}".format(n_permutations, permutation_p_value[i]), name)
 
 
 class Plot(object):
@@ -181,17 +180,19 @@ class Plot(object):
     axis_label_font_size = 14
     ticks_font_size = 14
 
-    def __init__(self, folder, monkey):
+    def __init__(self, folder, monkey, results):
 
         self.monkey = monkey
+        self.results = results
         self.fig_name = "{}/{}_equal_expected_value.pdf"\
             .format(folder, monkey)
 
-    def plot(self, results):
+    def draw(self, fig):
 
-        fig, ax = plt.subplots()
+        ax = fig.add_subplot(111)
 
         names = ["Gain", "Loss"]
+        results = self.results
 
         ax.scatter(names, (results["gains"], results["losses"]), color=("C0", "C1"), s=80, zorder=2)
 
@@ -199,25 +200,27 @@ class Plot(object):
         ax.set_xlabel("\nLotteries potential outputs\nMonkey {}.".format(self.monkey[0]),
                       fontsize=self.axis_label_font_size)
 
-        plt.xticks(fontsize=self.ticks_font_size)
-
-        plt.yticks([0, 0.25, 0.5, 0.75, 1], fontsize=self.ticks_font_size)
+        ax.set_yticks([0, 0.25, 0.5, 0.75, 1])
+        ax.tick_params(axis='both', labelsize=self.ticks_font_size)
         ax.set_ylabel(
             "F(Choose riskiest option)",
             fontsize=self.axis_label_font_size)
 
         ax.set_aspect(2)
-        plt.tight_layout()
-        # plt.legend()
+        fig.tight_layout()
+
+    def job(self):
 
-        fig.savefig(fname=self.fig_name)
-        plt.close()
+        return FigureJob(draw=self.draw, fig_name=self.fig_name)
 
 
 def main(force=False):
 
     makedirs(parameters.folders["figures"], exist_ok=True)
 
+    jobs = []
+    counts = {}
+
     for monkey in ["Havane", "Gladys"]:
 
         log(monkey, name="__main__.exemplary_case")
@@ -226,26 +229,23 @@ def main(force=False):
 
         analyst = Analyst()
 
-        b = Backup(monkey, kind_of_analysis="data", folder=parameters.folders["pickle"])
-        data = b.load()
-
-        if force is True or data is None:
-
-            data = import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point,
-                               database_path=parameters.database_path)
-
-            b.save(data)
+        data = cached_import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point,
+                                  database_path=parameters.database_path, force=force)
 
         sorted_data = analyst.get_sorted_data(data)
 
         n_trials = sorted_data["n_trials"]
 
-        results = analyst.run(sorted_data)
+        results, counts[monkey] = analyst.run(sorted_data)
 
         log("N trials: {}".format(n_trials), "exemplary_case.__main__")
 
-        plot = Plot(folder=parameters.folders["figures"], monkey=monkey)
-        plot.plot(results)
+        plot = Plot(folder=parameters.folders["figures"], monkey=monkey, results=results)
+        jobs.append(plot.job())
+
+    compare_gains_and_losses(counts)
+
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
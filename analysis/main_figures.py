@@ -4,6 +4,7 @@ from analysis.utility_function_plot import UtilityFunctionPlot
 from analysis.softmax_plot import SoftmaxPlot
 from analysis.probability_distorsion_plot import ProbabilityDistortionPlot
 from analysis.parameters import parameters
+from analysis.tools.plotting import Plotter
 
 
 """
@@ -13,19 +14,24 @@ Produce all figures based on parametrization *once the fitting has been done*
 
 def main():
 
+    jobs = []
+
     for monkey in ["Havane", "Gladys"]:
 
         with open("{}/{}_fit.json".format(parameters.folders["fit"], monkey)) as f:
             data = json.load(f)
 
         pdp = ProbabilityDistortionPlot(monkey=monkey, alpha=data["probability_distortion"])
-        pdp.plot()
+        jobs.append(pdp.job())
 
         sp = SoftmaxPlot(monkey=monkey, temp=data["temp"])
-        sp.plot()
+        jobs.append(sp.job())
 
         ufp = UtilityFunctionPlot(monkey=monkey, param=data)
-        ufp.plot()
+        jobs.append(ufp.job())
+
+    # All figures are rendered at once, in parallel
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,14 @@
 import itertools as it
-from os import makedirs, path
+from os import makedirs
 import tqdm
 
 import numpy as np
 import json
 from scipy.stats import binom
 
+from analysis.tools import model
 from analysis.tools.model import ProspectTheoryModel
-
-from data_management.data_manager import import_data
+from analysis.tools.cache import Cache, cached_import_data
 
 from utils.utils import log
 
@@ -181,78 +181,59 @@ class AlternativesNKGetter(object):
         return alternatives, n, k
 
 
-def get_model_data(npy, alternatives, 
+def get_model_data(cache, alternatives,
                    range_parameters,
                    n_values_per_parameter,
                    force=False):
 
-    if all([path.exists(file) for file in npy.values()]) and not force:
-
-        parameters_it = np.load(npy["parameters"])
-        p = np.load(npy["p"])
-
-        return parameters_it, p
-
-    else:
+    def compute():
 
         m = ModelRunner()
         m.run(alternatives=alternatives,
               range_parameters=range_parameters,
               n_values_per_parameter=n_values_per_parameter)
 
-        try:
-            np.save(npy["parameters"], m.parameters_list)
-            np.save(npy["p"], m.p_list)
-
-        except Exception as e:
-            log("Could not save: {}".format(e))
+        return {"parameters": np.asarray(m.parameters_list), "p": m.p_list}
 
-        return m.parameters_list, m.p_list
+    key = cache.key(
+        "model", code=(__file__, model.__file__),
+        alternatives=np.asarray(alternatives), range_parameters=range_parameters,
+        n_values_per_parameter=n_values_per_parameter)
 
+    results = cache.get(key, compute, force=force)
 
-def get_monkey_data(monkey, npy, starting_point, end_point, database_path=None, force=False):
+    return results["parameters"], results["p"]
 
-    if all([path.exists(file) for file in npy.values()]) and not force:
 
-        alternatives = np.load(npy["alternatives"])
-        n = np.load(npy["n"])
-        k = np.load(npy["k"])
+def get_monkey_data(cache, monkey, starting_point, end_point, database_path=None, force=False):
 
-    else:
+    data = cached_import_data(
+        monkey=monkey, starting_point=starting_point, end_point=end_point, database_path=database_path,
+        cache=cache, force=force)
 
-        data = \
-            import_data(monkey=monkey, starting_point=starting_point, end_point=end_point, database_path=database_path)
+    def compute():
 
         alternatives_n_k_getter = AlternativesNKGetter(data)
         alternatives, n, k = alternatives_n_k_getter.run()
+        return {"alternatives": np.asarray(alternatives), "n": np.asarray(n), "k": np.asarray(k)}
 
-        try:
-            np.save(npy["n"], n)
-            np.save(npy["k"], k)
-            np.save(npy["alternatives"], alternatives)
-        except Exception as e:
-            print("Could not save: {}".format(e))
+    key = cache.key("{}_alternatives".format(monkey), code=(__file__, ), data=data)
+    results = cache.get(key, compute, force=force)
 
-    return alternatives, n, k
+    return results["alternatives"], results["n"], results["k"]
 
 
-def get_lls(n, k, p, npy_file, force=False):
+def get_lls(cache, n, k, p, force=False):
 
-    if path.exists(npy_file) and not force:
-
-        lls = np.load(npy_file)
-
-    else:
+    def compute():
 
         lls_computer = LlsComputer()
         lls_computer.prepare(k=k, n=n, p=p)
-        lls = lls_computer.run()
+        return lls_computer.run()
 
-        try:
-            np.save(npy_file, lls)
-        except Exception as e:
-            print("Could not save: {}".format(e))
-    return lls
+    key = cache.key("lls", code=(__file__, ), n=n, k=k, p=p)
+
+    return cache.get(key, compute, force=force)
 
 
 def treat_results(monkey, lls_list, parameters, json_file):
@@ -282,23 +263,10 @@ def main(force=False):
     for folder in folders.values():
         makedirs(folder, exist_ok=True)
 
-    files = dict()
-    files["model"] = {
-        "p": "{}/{}.npy".format(folders["npy"], "model_p"),
-        "parameters": "{}/{}.npy".format(folders["npy"], "model_parameters")
-    }
-
-    for monkey in ["Havane", "Gladys"]:
+    cache = Cache()
 
-        files[monkey] = {
-            "data": {
-                "alternatives": "{}/{}_{}.npy".format(folders["npy"], monkey, "alternatives"),
-                "n": "{}/{}_{}.npy".format(folders["npy"], monkey, "n"),
-                "k": "{}/{}_{}.npy".format(folders["npy"], monkey, "k"),
-            },
-            "LLS": "{}/{}_{}.npy".format(folders["npy"], monkey, "lls"),
-            "fit": "{}/{}_{}.json".format(folders["fit"], monkey, "fit")  # What will be used for producing figures
-        }
+    # What will be used for producing figures
+    fit_files = {monkey: "{}/{}_{}.json".format(folders["fit"], monkey, "fit") for monkey in ["Havane", "Gladys"]}
 
     monkeys = ["Gladys", "Havane"]
 
@@ -310,27 +278,26 @@ def main(force=False):
 
         log("Getting experimental data for {}...".format(monkey), name="modelling.__main__")
         alternatives, n, k = get_monkey_data(
-            monkey=monkey, starting_point=starting_point, end_point=end_point,
-            database_path=database_path,
-            npy=files[monkey]["data"], force=force)
+            cache=cache, monkey=monkey, starting_point=starting_point, end_point=end_point,
+            database_path=database_path, force=force)
 
         log("Getting model predictions for {}...".format(monkey), name="modelling.__main__")
         parameters, p = \
             get_model_data(
                 range_parameters=range_parameters,
-                n_values_per_parameter=n_values_per_parameter,           
-                npy=files["model"], alternatives=alternatives, force=True)
+                n_values_per_parameter=n_values_per_parameter,
+                cache=cache, alternatives=alternatives, force=force)
 
         log("Getting the best parameters for {}...".format(monkey), name="modelling.__main__")
         lls_list = get_lls(
             k=k,
             n=n,
             p=p,
-            npy_file=files[monkey]["LLS"], force=force)
+            cache=cache, force=force)
 
         treat_results(
             monkey=monkey, lls_list=lls_list, parameters=parameters,
-            json_file=files[monkey]["fit"])
+            json_file=fit_files[monkey])
 
         log("Done!", name="modelling.__main__")
 
@@ -1,9 +1,7 @@
 from pylab import np
 
-from data_management.data_manager import import_data
-
 from analysis.parameters import parameters
-from analysis.tools.backup import Backup
+from analysis.tools.cache import cached_import_data
 
 
 """
@@ -277,14 +275,9 @@ def main(force=False):
         print(monkey.upper())
         print()
 
-        b = Backup(monkey, kind_of_analysis="data", folder=parameters.folders["pickle"])
-        data = b.load()
-
-        if force is True or data is None:
-
-            starting_point = parameters.starting_points[monkey]
-            data = import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point)
-            b.save(data)
+        starting_point = parameters.starting_points[monkey]
+        data = cached_import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point,
+                                  force=force)
 
         analyst = Analyst(data=data)
 
@@ -11,8 +11,11 @@ database_path = "data/results_2017_09_31.db"
 # Path for all the analysis results
 folder_path = "results_analysis"
 
-# Subfolders for figures, fit, and other data files produced for analysis
-folders = {key: folder_path + "/" + key for key in ["figures", "fit", "npy", "pickle"]}
+# Subfolders for figures, fit, and cached analysis results
+folders = {key: folder_path + "/" + key for key in ["figures", "fit", "cache"]}
+
+# Maximal size (in bytes) of the cached analysis results; least recently used results are removed beyond
+cache_max_size = 2 * 1024 ** 3
 
 # Range of parameters for the fit
 range_parameters = {
@@ -1,11 +1,11 @@
-from pylab import np, plt
-from scipy.optimize import curve_fit
+import numpy as np
 from os import makedirs
 
-from data_management.data_manager import import_data
 from utils.utils import log
 from analysis.parameters import parameters
-from analysis.tools.backup import Backup
+from analysis.tools.cache import cached_import_data
+from analysis.tools.plotting import FigureJob, Plotter
+from analysis.tools.logistic import fit_sigmoids, sigmoid
 
 
 """ 
@@ -26,126 +26,115 @@ class Analyst(object):
 
         self.data = data
 
-    @staticmethod
-    def expected_value(lottery):
+    def get_choices_for_incongruent_trials(self, condition, groups=None):
 
-        return lottery[0] * lottery[1]
+        """
+        Count the choices of the riskiest option for every pair of lotteries (and every group of trials)
+        :param groups: group of each trial (e.g. the session); every trial belongs to the same group if None
+        :return: groups, alternatives ((p, x0) of the riskiest option, (p, x0) of the safest one), hits, n
+        """
 
-    def is_trial_with_losses_only(self, t):
+        p_left, p_right = np.asarray(self.data["p"]["left"]), np.asarray(self.data["p"]["right"])
+        x0_left, x0_right = np.asarray(self.data["x0"]["left"]), np.asarray(self.data["x0"]["right"])
+        choice = np.asarray(self.data["choice"])
 
-        return self.data["x0"]["left"][t] < 0 and self.data["x0"]["right"][t] < 0
+        with_gains_only = (x0_left > 0) & (x0_right > 0)
+        with_losses_only = (x0_left < 0) & (x0_right < 0)
 
-    def is_trial_with_gains_only(self, t):
+        riskiest_on_left = (with_gains_only | with_losses_only) & \
+            (p_left < p_right) & (np.absolute(x0_left) > np.absolute(x0_right))
+        riskiest_on_right = (with_gains_only | with_losses_only) & \
+            (p_left > p_right) & (np.absolute(x0_left) < np.absolute(x0_right))
 
-        return self.data["x0"]["left"][t] > 0 and self.data["x0"]["right"][t] > 0
+        selected = riskiest_on_left | riskiest_on_right
+        if condition == "with_gains_only":
+            selected &= with_gains_only
+        elif condition == "with_losses_only":
+            selected &= with_losses_only
 
-    def is_trial_with_riskiest_option_on_left(self, t):
+        left = riskiest_on_left[selected]
 
-        if self.is_trial_with_gains_only(t) or self.is_trial_with_losses_only(t):
+        rows = np.column_stack((
+            np.zeros(left.size) if groups is None else np.asarray(groups)[selected],
+            np.where(left, p_left[selected], p_right[selected]),
+            np.where(left, x0_left[selected], x0_right[selected]),
+            np.where(left, p_right[selected], p_left[selected]),
+            np.where(left, x0_right[selected], x0_left[selected])
+        ))
 
-            return self.data["p"]["left"][t] < self.data["p"]["right"][t] and \
-                np.absolute(self.data["x0"]["left"][t]) > np.absolute(self.data["x0"]["right"][t])
+        choose_risky = choice[selected] == np.where(left, "left", "right")
 
-        else:
-            return False
-
-    def is_trial_with_riskiest_option_on_right(self, t):
-
-        if self.is_trial_with_gains_only(t) or self.is_trial_with_losses_only(t):
-
-            return self.data["p"]["left"][t] > self.data["p"]["right"][t] and \
-                   np.absolute(self.data["x0"]["left"][t]) < np.absolute(self.data["x0"]["right"][t])
-
-        else:
-            return False
-
-    def get_choices_for_incongruent_trials(self, condition):
-
-        results = {}
+        # One row per (group, pair of lotteries), sorted
+        unique_rows, idx = np.unique(rows, axis=0, return_inverse=True)
+        idx = idx.ravel()
 
-        n_trials = len(self.data["p"]["left"])
+        hits = np.bincount(idx, weights=choose_risky, minlength=len(unique_rows))
+        n = np.bincount(idx, minlength=len(unique_rows))
 
-        for t in range(n_trials):
+        alternatives = unique_rows[:, 1:].reshape(-1, 2, 2)
 
-            if (not condition == "with_gains_only" or self.is_trial_with_gains_only(t)) and \
-                    (not condition == "with_losses_only" or self.is_trial_with_losses_only(t)):
+        return unique_rows[:, 0].astype(int), alternatives, hits, n
 
-                if self.is_trial_with_riskiest_option_on_left(t):
+    def compute(self, alternatives, hits, n):
 
-                    risky, safe = "left", "right"
+        expected_values_differences = \
+            alternatives[:, 0, 0] * alternatives[:, 0, 1] - alternatives[:, 1, 0] * alternatives[:, 1, 1]
+        risky_choice_means = hits / n
 
-                elif self.is_trial_with_riskiest_option_on_right(t):
-
-                    risky, safe = "right", "left"
-
-                else:
-                    continue
-
-                alternative = (
-                    (self.data["p"][risky][t], self.data["x0"][risky][t]),
-                    (self.data["p"][safe][t], self.data["x0"][safe][t])
-                )
-
-                choose_risky = int(self.data["choice"][t] == risky)
+        log("Pairs of lotteries used:", self.name)
 
-                if alternative not in results.keys():
-                    results[alternative] = []
+        for i, alternative in enumerate(alternatives):
 
-                results[alternative].append(choose_risky)
+            log("({}) {} delta: {}, mean: {}, n: {}".format(
+                i, alternative.tolist(), expected_values_differences[i], risky_choice_means[i], n[i]),
+                self.name)
 
-        return results
+        log("Number of pairs of lotteries: {}".format(len(n)), self.name)
 
-    def compute(self, results):
+        log("A few stats about the number of trials for a specific pair", self.name)
 
-        expected_values_differences = []
-        risky_choice_means = []
-        n_trials = []
+        log("Min: {}".format(np.min(n)), self.name)
+        log("Max: {}".format(np.max(n)), self.name)
+        log("Median {}:".format(np.median(n)), self.name)
+        log("Mean: {}".format(np.mean(n)), self.name)
+        log("Std: {}".format(np.std(n)), self.name)
+        log("Sum: {}".format(np.sum(n)), self.name)
 
-        r_keys = list(sorted(results.keys()))
+        return expected_values_differences, risky_choice_means
 
-        log("Pairs of lotteries used:", self.name)
-        
-        for i, alternative in enumerate(r_keys):
+    def run(self, condition):
 
-            delta = self.expected_value(alternative[0]) - self.expected_value(alternative[1])
-            expected_values_differences.append(delta)
+        assert condition in ["with_gains_only", "with_losses_only"]
 
-            mean = np.mean(results[alternative])
-            risky_choice_means.append(mean)
+        log("Selected condition: {}".format(condition), self.name)
 
-            n = len(results[alternative])
+        _, alternatives, hits, n = self.get_choices_for_incongruent_trials(condition)
 
-            n_trials.append(n)
+        expected_values_differences, risky_choice_means = self.compute(alternatives, hits, n)
 
-            log("({}) {} delta: {}, mean: {}, n: {}".format(i, alternative, delta, ", mean: ", mean, ", n:", n),
-                self.name)
+        log("N 'risky' trials  in condition '{}': {}".format(condition, np.sum(n)), self.name)
 
-        log("Number of pairs of lotteries: {}".format(len(n_trials)), self.name)
-        
-        log("A few stats about the number of trials for a specific pair", self.name)
-        
-        log("Min: {}".format(np.min(n_trials)), self.name)
-        log("Max: {}".format(np.max(n_trials)), self.name)
-        log("Median {}:".format(np.median(n_trials)), self.name)
-        log("Mean: {}".format(np.mean(n_trials)), self.name)
-        log("Std: {}".format(np.std(n_trials)), self.name)
-        log("Sum: {}".format(np.sum(n_trials)), self.name)
-        
-        return expected_values_differences, risky_choice_means, np.sum(n_trials)
+        return expected_values_differences, hits, n
 
-    def run(self, condition):
 
-        assert condition in ["with_gains_only", "with_losses_only"]
+def fit(results):
 
-        log("Selected condition: {}".format(condition), self.name)
+    """
+    Fit a sigmoid for every set of results at once
+    :param results: dictionary whose values are (expected values differences, hits, n)
+    :return: dictionary with the same keys whose values are (x0, k)
+    """
 
-        results = self.get_choices_for_incongruent_trials(condition)
+    keys = sorted(results.keys())
 
-        expected_values_differences, risky_choice_means, n_trials = self.compute(results)
+    x = np.concatenate([results[key][0] for key in keys])
+    hits = np.concatenate([results[key][1] for key in keys])
+    n = np.concatenate([results[key][2] for key in keys])
+    groups = np.concatenate([np.full(len(results[key][0]), i) for i, key in enumerate(keys)])
 
-        log("N 'risky' trials  in condition '{}': {}".format(condition, n_trials), self.name)
+    x0, k = fit_sigmoids(x=x, hits=hits, n=n, groups=groups, n_groups=len(keys))
 
-        return expected_values_differences, risky_choice_means, n_trials
+    return {key: (x0[i], k[i]) for i, key in enumerate(keys)}
 
 
 class RiskyChoiceAgainstExpectValuePlot(object):
@@ -159,104 +148,98 @@ class RiskyChoiceAgainstExpectValuePlot(object):
 
     name = "RiskyChoiceAgainstExpectValuePlot"
 
-    def __init__(self):
+    def __init__(self, expected_values_differences, hits, n, fit_parameters, color, fig_name):
 
-        pass
+        self.expected_values_differences = expected_values_differences
+        self.risky_choice_means = hits / n
+        self.n_trials = np.sum(n)
+        self.fit_parameters = fit_parameters
+        self.color = color
+        self.fig_name = fig_name
 
-    def plot(self, expected_values_differences, risky_choice_means, n_trials, color):
+    def draw(self, fig):
 
-        x_data = expected_values_differences
-        y_data = risky_choice_means
+        ax = fig.add_subplot(111)
 
-        try:
+        x_data = self.expected_values_differences
+        y_data = self.risky_choice_means
 
-            p_opt, p_cov = curve_fit(self.sigmoid, x_data, y_data)
+        if np.all(np.isfinite(self.fit_parameters)):
 
             n_points = 50  # Arbitrary neither too small, or too large
             x = np.linspace(min(x_data), max(x_data), n_points)
-            y = self.sigmoid(x, *p_opt)
-            plt.plot(x, y, color=color, label='fit', linewidth=self.line_width)
+            y = sigmoid(x, *self.fit_parameters)
+            ax.plot(x, y, color=self.color, label='fit', linewidth=self.line_width)
 
-        except RuntimeError as e:
-            log(e)
-
-        plt.scatter(x_data, y_data, color=color, label='data', s=self.point_size)
-
-        log("Plot results coming from {} trials".format(n_trials), self.name)
-
-    def close_and_save(self, fig_name):
+        else:
+            log("Could not fit the data.", self.name)
 
-        plt.ylim(-0.01, 1.01)
+        ax.scatter(x_data, y_data, color=self.color, label='data', s=self.point_size)
 
-        # Add comment for number of trials
-        # plt.text(min(x_data) + 0.75 * (max(x_data) - min(x_data)), 0.1, "n trials: {}".format(n_trials),
-        #          fontsize=self.comment_font_size)
+        log("Plot results coming from {} trials".format(self.n_trials), self.name)
 
-        # Add legend
-        # plt.legend(loc='upper left', fontsize=self.legend_font_size)
+        ax.set_ylim(-0.01, 1.01)
 
         # Axis labels
-        plt.xlabel("$EV_{\mathrm{Riskiest\,Option}} - EV_{\mathrm{Safest\,Option}}$",
-                   fontsize=self.axis_label_font_size)
-        plt.ylabel("F(Choose riskiest option)",
-                   fontsize=self.axis_label_font_size)
+        ax.set_xlabel("$EV_{\\mathrm{Riskiest\\,Option}} - EV_{\\mathrm{Safest\\,Option}}$",
+                      fontsize=self.axis_label_font_size)
+        ax.set_ylabel("F(Choose riskiest option)",
+                      fontsize=self.axis_label_font_size)
 
         # Remove top and right borders
-        ax = plt.gca()
         ax.spines['right'].set_color('none')
         ax.xaxis.set_ticks_position('bottom')
         ax.yaxis.set_ticks_position('left')
         ax.spines['bottom'].set_position(('data', 0))
         ax.spines['top'].set_color('none')
 
-        plt.tight_layout()
+        fig.tight_layout()
 
-        plt.tick_params(axis='both', which='major', labelsize=self.ticks_label_font_size)
-        plt.tick_params(axis='both', which='minor', labelsize=self.ticks_label_font_size)
+        ax.tick_params(axis='both', which='major', labelsize=self.ticks_label_font_size)
+        ax.tick_params(axis='both', which='minor', labelsize=self.ticks_label_font_size)
 
-        plt.savefig(fname=fig_name)
-        plt.close()
+    def job(self):
 
-    @staticmethod
-    def sigmoid(x, x0, k):
-        y = 1 / (1 + np.exp(-k * (x - x0)))
-        return y
+        return FigureJob(draw=self.draw, fig_name=self.fig_name)
 
 
 def main(force=False):
 
     makedirs(parameters.folders["figures"], exist_ok=True)
 
-    for monkey in ["Havane", "Gladys"]:
+    conditions = ["with_gains_only", "with_losses_only"]
 
-        log(monkey, name="preference_towards_risk_against_expected_value.__main__")
+    results = {}
 
-        b = Backup(monkey, kind_of_analysis="data", folder=parameters.folders["pickle"])
-        data = b.load()
+    for monkey in ["Havane", "Gladys"]:
 
-        if force is True or data is None:
+        log(monkey, name="preference_towards_risk_against_expected_value.__main__")
 
-            starting_point = parameters.starting_points[monkey]
-            data = import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point,
-                               database_path=parameters.database_path)
-            b.save(data)
+        starting_point = parameters.starting_points[monkey]
+        data = cached_import_data(monkey=monkey, starting_point=starting_point, end_point=parameters.end_point,
+                                  database_path=parameters.database_path, force=force)
 
         analyst = Analyst(data=data)
 
-        plot = RiskyChoiceAgainstExpectValuePlot()
+        for condition in conditions:
+            results[(monkey, condition)] = analyst.run(condition=condition)
 
-        results = {}
+    # Every monkey and every condition are fitted at once
+    fit_parameters = fit(results)
 
-        for condition in ["with_gains_only", "with_losses_only"]:
+    jobs = []
 
-            results[condition] = analyst.run(condition=condition)
+    for (monkey, condition), r in sorted(results.items()):
 
-            plot.plot(*results[condition], color="C0" if condition == "with_gains_only" else "C1")
+        fig_name = "{}/{}_{}_{}.pdf" \
+            .format(parameters.folders["figures"], monkey, get_script_name(), condition)
 
-            fig_name = "{}/{}_{}_{}.pdf" \
-                .format(parameters.folders["figures"], monkey, get_script_name(), condition)
+        plot = RiskyChoiceAgainstExpectValuePlot(
+            *r, fit_parameters=fit_parameters[(monkey, condition)],
+            color="C0" if condition == "with_gains_only" else "C1", fig_name=fig_name)
+        jobs.append(plot.job())
 
-            plot.close_and_save(fig_name=fig_name)
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 import os
-from pylab import np, plt
+import numpy as np
 import json
 
 from analysis.parameters import parameters
+from analysis.tools.plotting import FigureJob, Plotter, render
 
 
 """
@@ -36,40 +37,44 @@ class ProbabilityDistortionPlot:
 
         return np.exp(-(-np.log(p))**self.alpha)
 
-    def plot(self):
+    def draw(self, fig):
+
+        fig.subplots_adjust(left=0.15, right=0.9, bottom=0.2, top=0.9)
 
-        plt.subplots_adjust(left=0.15, right=0.9, bottom=0.2, top=0.9)
+        ax = fig.add_subplot(111)
 
         X = np.linspace(0.001, 1, self.n_points)
-        plt.plot(
+        ax.plot(
             X, self.w(X), label=r'$\alpha = {}$'.format(self.alpha),
             color="black", linewidth=self.line_width)
 
-        plt.xlabel('$p$\nMonkey {}.'.format(self.monkey[0]), fontsize=self.label_font_size)
-        plt.ylabel('$w(p)$', fontsize=self.label_font_size)
+        ax.set_xlabel('$p$\nMonkey {}.'.format(self.monkey[0]), fontsize=self.label_font_size)
+        ax.set_ylabel('$w(p)$', fontsize=self.label_font_size)
 
-        plt.ylim(0, 1)
-        plt.figaspect(1)
-
-        ax = plt.gca()
+        ax.set_ylim(0, 1)
 
         ax.spines['right'].set_color('none')
         ax.xaxis.set_ticks_position('bottom')
         ax.yaxis.set_ticks_position('left')
         ax.spines['top'].set_color('none')
 
-        plt.xticks([0, 0.25, 0.5, 0.75, 1], fontsize=self.ticks_label_size)
-        plt.yticks([0, 0.25, 0.5, 0.75, 1], fontsize=self.ticks_label_size)
+        ax.set_xticks([0, 0.25, 0.5, 0.75, 1])
+        ax.set_yticks([0, 0.25, 0.5, 0.75, 1])
+        ax.tick_params(axis='both', labelsize=self.ticks_label_size)
 
-        plt.figaspect(1)
+    def job(self):
 
-        plt.savefig(self.fig_name)
+        return FigureJob(draw=self.draw, fig_name=self.fig_name)
 
-        plt.close()
+    def plot(self):
+
+        render(self.job())
 
 
 def main():
 
+    jobs = []
+
     for monkey in ["Havane", "Gladys"]:
 
         fit_results = "{}/{}_fit.json".format(parameters.folders["fit"], monkey)
@@ -81,7 +86,9 @@ def main():
             data = json.load(f)
 
         pdp = ProbabilityDistortionPlot(monkey=monkey, alpha=data["probability_distortion"])
-        pdp.plot()
+        jobs.append(pdp.job())
+
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
@@ -4,13 +4,13 @@ from pylab import plt, np
 from scipy.signal import savgol_filter
 from scipy.interpolate import interp1d
 
-from data_management.data_manager import import_data
 from analysis.tools.data_sorter import sort_data
 
 from analysis.parameters.parameters import folders
 
-from analysis.tools.backup import Backup
+from analysis.tools.cache import Cache, cached_import_data
 from analysis.tools.progress_analyst import ProgressAnalyst
+from utils.utils import today
 
 
 """
@@ -106,27 +106,27 @@ class Plot:
         plt.close()
 
 
-def main(make_only_figures=True):
+def main(force=False):
 
     starting_point = "2017-03-01"
 
     sort_type = "day"
 
+    cache = Cache()
+
     for monkey in ["Havane", "Gladys"]:
 
-        b = Backup(monkey, "progress{}".format(sort_type))
-        results = b.load()
+        data = cached_import_data(monkey=monkey, starting_point=starting_point, end_point=today(), cache=cache)
 
-        if not make_only_figures or results is None:
+        def analyse():
 
-            # Get data and sort it
-            data = import_data(monkey=monkey, starting_point=starting_point)
+            # Sort data and assess progress for each group
             sorted_data = sort_data(data=data, sort_type=sort_type)
-
             pr = ProgressPerArbitraryPool(sorted_data=sorted_data)
-            results = pr.run()
+            return pr.run()
 
-            b.save(results)
+        key = cache.key("{}_progress_{}".format(monkey, sort_type), code=(__file__, ), data=data)
+        results = cache.get(key, analyse, force=force)
 
         pl = Plot(monkey=monkey, results=results, cond=sort_type)
         pl.plot()
@@ -1,12 +1,12 @@
 import json
 import os
 
-from data_management.data_manager import import_data
-from analysis.tools.progress_analyst import ProgressAnalyst
+from data_management.aggregates import progress as get_progress
 from analysis.parameters import parameters
 
 """
 Supp: Produce a json file with summarizes the success rates per monkey.
+Success rates come from the per-session aggregates (see data_management/aggregates.py).
 """
 
 
@@ -19,15 +19,12 @@ def main():
 
         starting_point = parameters.starting_points[monkey]
 
-        data = import_data(monkey=monkey, starting_point=starting_point,
-                           end_point=parameters.end_point, database_path=parameters.database_path)
+        progress = get_progress(monkey=monkey, starting_point=starting_point,
+                                end_point=parameters.end_point, database_path=parameters.database_path)
 
-        progress = dict()
-
-        pa = ProgressAnalyst(p=data["p"], x0=data["x0"], choice=data["choice"])
-
-        for key in ProgressAnalyst.control_conditions:
-            progress[key] = pa.analyse(key)
+        for key, success_rate in progress.items():
+            if success_rate is not None:
+                print("Success rate with {}: {:.2f}".format(key, success_rate))
 
         folder = parameters.folder_path
         os.makedirs(folder, exist_ok=True)
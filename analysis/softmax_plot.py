@@ -1,8 +1,9 @@
 import os
-from pylab import np, plt
+import numpy as np
 import json
 
 from analysis.parameters import parameters
+from analysis.tools.plotting import FigureJob, Plotter, render
 
 """
 Produce softmax function figure
@@ -33,39 +34,46 @@ class SoftmaxPlot(object):
 
         return 1/(1+np.exp(-difference/self.temp))
 
-    def plot(self):
+    def draw(self, fig):
+
+        ax = fig.add_subplot(111)
 
         x = np.arange(-1, 1, 0.01)
-        plt.plot(
+        ax.plot(
             x, self.softmax(x), label=r'$\tau = {}$'.format(self.temp),
             color="black", linewidth=self.line_width)
 
-        plt.xlabel(
+        ax.set_xlabel(
             '$U(L_1) - U(L_2)$\nMonkey {}.'.format(self.monkey[0]),
             fontsize=self.label_font_size, labelpad=22)
-        plt.ylabel('P(Choose $L_1$)', fontsize=self.label_font_size, labelpad=12)
-
-        plt.ylim(0, 1)
-        plt.figaspect(1)
+        ax.set_ylabel('P(Choose $L_1$)', fontsize=self.label_font_size, labelpad=12)
 
-        ax = plt.gca()
+        ax.set_ylim(0, 1)
 
         ax.spines['right'].set_color('none')
         ax.xaxis.set_ticks_position('bottom')
         ax.yaxis.set_ticks_position('left')
         ax.spines['top'].set_color('none')
 
-        plt.xticks([-1, -0.5, 0, 0.5, 1], fontsize=self.ticks_label_size)
-        plt.yticks([0, 0.25, 0.5, 0.75, 1], fontsize=self.ticks_label_size)
+        ax.set_xticks([-1, -0.5, 0, 0.5, 1])
+        ax.set_yticks([0, 0.25, 0.5, 0.75, 1])
+        ax.tick_params(axis='both', labelsize=self.ticks_label_size)
 
-        plt.tight_layout()
+        fig.tight_layout()
 
-        plt.savefig(self.fig_name)
-        plt.close()
+    def job(self):
+
+        return FigureJob(draw=self.draw, fig_name=self.fig_name)
+
+    def plot(self):
+
+        render(self.job())
 
 
 def main():
 
+    jobs = []
+
     for monkey in ["Havane", "Gladys"]:
 
         fit_results = "{}/{}_fit.json".format(parameters.folders["fit"], monkey)
@@ -77,7 +85,9 @@ def main():
             data = json.load(f)
 
         sp = SoftmaxPlot(temp=data["temp"], monkey=monkey)
-        sp.plot()
+        jobs.append(sp.job())
+
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,228 @@
+from os import makedirs, path, listdir, remove, replace, getpid, stat, utime
+import hashlib
+import pickle
+
+import numpy as np
+
+from data_management.data_manager import import_data
+from data_management import data_manager, database
+from utils.utils import log
+
+from analysis.parameters import parameters
+from analysis.tools.digest import digest, file_digest
+
+
+"""
+Cache for analysis results, where results are indexed by a hash of:
+- the inputs used for computing them;
+- the analysis parameters (analysis/parameters/parameters.py);
+- the code that produced them.
+Results made of (nested dictionaries of) arrays are stored as '.npz' archives, other results are pickled.
+"""
+
+
+def parameters_digest():
+
+    values = {k: v for k, v in vars(parameters).items() if not k.startswith("_") and not callable(v)
+              and not hasattr(v, "__file__")}
+    return digest(values)
+
+
+class Cache(object):
+
+    name = "Cache"
+
+    separator = "/"
+
+    def __init__(self, folder=None, max_size=None):
+
+        self.folder = folder if folder is not None else parameters.folders["cache"]
+        self.max_size = max_size if max_size is not None else parameters.cache_max_size
+
+        makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def key(kind, code=(), **inputs):
+
+        """
+        :param kind: kind of analysis (used as a prefix for the name of the file)
+        :param code: source files of the code producing the result
+        :param inputs: everything the result depends on (arrays, dictionaries, scalars...)
+        """
+
+        h = hashlib.sha1()
+        h.update(digest(inputs).encode())
+        h.update(parameters_digest().encode())
+
+        for file_path in sorted(code):
+            h.update(file_digest(file_path).encode())
+
+        return "{}_{}".format(kind, h.hexdigest())
+
+    # ------------------------------------------ SERIALIZATION ----------------------------------------------- #
+
+    @classmethod
+    def flatten(cls, data, prefix=""):
+
+        """
+        Return a flat dictionary of arrays, or None if data is not made only of arrays (lists, scalars... are pickled,
+        so that they are loaded back with their own type)
+        """
+
+        if isinstance(data, dict):
+
+            if not data and prefix:
+                return None
+
+            flat = {}
+            for k, v in data.items():
+                if not isinstance(k, str) or cls.separator in k:
+                    return None
+                sub = cls.flatten(v, prefix="{}{}{}".format(prefix, k, cls.separator))
+                if sub is None:
+                    return None
+                flat.update(sub)
+
+            return flat
+
+        if not isinstance(data, np.ndarray) or data.dtype.hasobject or not prefix:
+            return None
+
+        return {prefix[:-len(cls.separator)]: data}
+
+    @classmethod
+    def unflatten(cls, archive):
+
+        data = {}
+        for flat_key in archive.files:
+
+            keys = flat_key.split(cls.separator)
+            container = data
+            for k in keys[:-1]:
+                container = container.setdefault(k, {})
+
+            value = archive[flat_key]
+            container[keys[-1]] = value
+
+        return data
+
+    def files(self, key):
+
+        return ["{}/{}.{}".format(self.folder, key, ext) for ext in ("npz", "p")]
+
+    def load(self, key):
+
+        for file_path in self.files(key):
+
+            if not path.exists(file_path):
+                continue
+
+            try:
+                if file_path.endswith(".npz"):
+                    with np.load(file_path, allow_pickle=False) as archive:
+                        data = self.unflatten(archive)
+                else:
+                    with open(file_path, "rb") as f:
+                        data = pickle.load(f)
+
+            except Exception as e:
+                log("Could not load '{}': {}".format(file_path, e), self.name)
+                continue
+
+            # Mark as recently used
+            utime(file_path)
+            log("Loaded '{}'.".format(file_path), self.name)
+            return data
+
+    def save(self, key, data):
+
+        flat = self.flatten(data)
+
+        npz_file, pickle_file = self.files(key)
+
+        file_path = None
+        if flat is not None:
+            try:
+                file_path = self.write(npz_file, lambda f: np.savez(f, **flat))
+            except ValueError as e:
+                log("Could not save '{}' as arrays ({}), pickle it.".format(key, e), self.name)
+
+        if file_path is None:
+            file_path = self.write(pickle_file, lambda f: pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+        self.evict(keep=path.basename(file_path))
+
+    @staticmethod
+    def write(file_path, dump):
+
+        # Write in a temporary file first: several processes may save the same result at once
+        tmp_file = "{}.{}.tmp".format(file_path, getpid())
+        try:
+            with open(tmp_file, "wb") as f:
+                dump(f)
+        except Exception:
+            remove(tmp_file)
+            raise
+
+        replace(tmp_file, file_path)
+        return file_path
+
+    def get(self, key, compute, force=False):
+
+        """ Return the result corresponding to 'key', computing it (and saving it) if necessary """
+
+        data = None if force else self.load(key)
+
+        if data is None:
+            data = compute()
+            self.save(key, data)
+
+        return data
+
+    def evict(self, keep=None):
+
+        """ Remove least recently used results until the total size of the cache fits in 'max_size' """
+
+        entries = []
+        for file_name in listdir(self.folder):
+            if file_name.endswith(".tmp") or file_name == keep:
+                continue
+            s = stat("{}/{}".format(self.folder, file_name))
+            entries.append((s.st_mtime, s.st_size, file_name))
+
+        total_size = sum(i[1] for i in entries)
+        if keep is not None:
+            total_size += stat("{}/{}".format(self.folder, keep)).st_size
+
+        for mtime, size, file_name in sorted(entries):
+
+            if total_size <= self.max_size:
+                break
+
+            try:
+                remove("{}/{}".format(self.folder, file_name))
+                total_size -= size
+                log("Evicted '{}'.".format(file_name), self.name)
+            except FileNotFoundError:
+                pass
+
+
+def cached_import_data(monkey, starting_point, end_point, database_path=None, force=False, cache=None):
+
+    """ Same as 'import_data', the result being cached as long as the database does not change """
+
+    cache = cache if cache is not None else Cache()
+
+    db_path = database.Database(database_path).db_path
+
+    key = cache.key(
+        "{}_data".format(monkey),
+        code=(data_manager.__file__, database.__file__),
+        monkey=monkey, starting_point=starting_point, end_point=end_point,
+        database=file_digest(db_path))
+
+    return cache.get(
+        key,
+        lambda: import_data(monkey=monkey, starting_point=starting_point, end_point=end_point,
+                            database_path=database_path),
+        force=force)
@@ -0,0 +1,87 @@
+import numpy as np
+from scipy import stats
+
+from utils.utils import log
+
+
+"""
+Statistics on contingency tables given directly as arrays of counts.
+Every function works on a whole batch of tables at once (leading dimensions of the arrays),
+e.g. one table per monkey
+"""
+
+
+name = "Contingency"
+
+
+def chi_square(observed, expected):
+
+    """
+    Chi squared statistic, the categories being along the last axis.
+    Categories both expected and observed empty are skipped; a table with observations in a category expected
+    empty has no statistic (nan, with a warning).
+    """
+
+    observed = np.asarray(observed, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+
+    empty = expected == 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(empty, 0., (observed - expected) ** 2 / expected)
+
+    undefined = np.any(empty & (observed != 0), axis=-1)
+    if np.any(undefined):
+        log("Observations in a category with an expected count of zero: chi squared statistic undefined (nan).",
+            name, level="warning")
+
+    return np.where(undefined, np.nan, np.sum(terms, axis=-1))[()]
+
+
+def chi_square_test(observed, expected, df=1, q=0.95):
+
+    """ :return: chi squared statistic, critical value for confidence 'q', and p-value """
+
+    chi_squared_stat = chi_square(observed, expected)
+    crit = stats.chi2.ppf(q=q, df=df)
+    p_value = stats.chi2.sf(x=chi_squared_stat, df=df)
+
+    return chi_squared_stat, crit, p_value
+
+
+def permutation_test(counts, n_permutations=10000, seed=None):
+
+    """
+    Two-sample permutation test on the frequency of a binary outcome.
+    Shuffling the pooled trials between the two samples makes the number of hits in the first sample
+    hypergeometric: all the resamples are drawn at once instead of permuting trials one by one.
+
+    :param counts: array of shape (..., 2, 2): (first sample, second sample) x (misses, hits)
+    :return: p-value of the absolute difference of frequencies, shape (...)
+    """
+
+    counts = np.asarray(counts, dtype=int)
+
+    misses, hits = counts[..., 0], counts[..., 1]
+    n = misses + hits
+
+    total_hits = hits.sum(axis=-1)
+    total_misses = misses.sum(axis=-1)
+    n_first, n_second = n[..., 0], n[..., 1]
+
+    observed = np.absolute(hits[..., 0] / n_first - hits[..., 1] / n_second)
+
+    rng = np.random.default_rng(seed)
+    shape = (n_permutations, ) + total_hits.shape
+
+    hits_first = rng.hypergeometric(
+        ngood=np.broadcast_to(total_hits, shape),
+        nbad=np.broadcast_to(total_misses, shape),
+        nsample=np.broadcast_to(n_first, shape))
+
+    resampled = np.absolute(hits_first / n_first - (total_hits - hits_first) / n_second)
+
+    # Small tolerance for considering as equal the differences that are equal up to float rounding
+    extreme = np.sum(resampled >= observed - 1e-12, axis=0)
+
+    return (extreme + 1) / (n_permutations + 1)
@@ -0,0 +1,69 @@
+from os import path, stat
+import hashlib
+
+import numpy as np
+
+
+"""
+Hashes of files and of analysis inputs (used for deciding if a result has to be computed again)
+"""
+
+
+# Digests of files already read, indexed by (path, size, modification time)
+_file_digests = {}
+
+
+def file_digest(file_path, chunk_size=2**20):
+
+    """ Hash of the content of a file ('missing' if the file does not exist) """
+
+    if not path.exists(file_path):
+        return "missing"
+
+    s = stat(file_path)
+    signature = (path.abspath(file_path), s.st_size, s.st_mtime_ns)
+
+    if signature not in _file_digests:
+
+        h = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+
+        _file_digests[signature] = h.hexdigest()
+
+    return _file_digests[signature]
+
+
+def update(h, obj):
+
+    if isinstance(obj, np.ndarray):
+        obj = np.ascontiguousarray(obj)
+        h.update("array{}{}".format(obj.dtype.str, obj.shape).encode())
+        if obj.dtype.hasobject:
+            h.update(repr(obj.tolist()).encode())
+        else:
+            h.update(obj.tobytes())
+
+    elif isinstance(obj, dict):
+        h.update("dict{}".format(len(obj)).encode())
+        for k in sorted(obj.keys(), key=repr):
+            update(h, k)
+            update(h, obj[k])
+
+    elif isinstance(obj, (list, tuple)):
+        h.update("{}{}".format(type(obj).__name__, len(obj)).encode())
+        for i in obj:
+            update(h, i)
+
+    else:
+        h.update("{}:{!r}".format(type(obj).__name__, obj).encode())
+
+
+def digest(obj):
+
+    """ Hash of (nested) dictionaries, lists, arrays and scalars """
+
+    h = hashlib.sha1()
+    update(h, obj)
+    return h.hexdigest()
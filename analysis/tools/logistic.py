@@ -0,0 +1,86 @@
+import numpy as np
+
+
+"""
+Fit of the logistic model  p(x) = 1 / (1 + exp(-k * (x - x0)))  by maximum likelihood on binomial counts,
+for many groups at once: all the groups are fitted simultaneously with Newton iterations on the summed
+log-likelihood, every group having its own (x0, k)
+"""
+
+
+def sigmoid(x, x0, k):
+
+    return 1 / (1 + np.exp(-k * (x - x0)))
+
+
+def fit_sigmoids(x, hits, n, groups=None, n_groups=None, max_iterations=100, tolerance=1e-8, ridge=1e-6):
+
+    """
+    :param x: value of the predictor for each point
+    :param hits: number of successes for each point
+    :param n: number of trials for each point
+    :param groups: index of the group of each point (a single group if None)
+    :param n_groups: number of groups (deduced from 'groups' if None)
+    :param ridge: small penalty on the parameters, keeping them finite when the groups are perfectly separated
+    :return: x0 and k (one value per group; nan for groups whose fit is undetermined, e.g. a single value of x)
+    """
+
+    x = np.asarray(x, dtype=float)
+    hits = np.asarray(hits, dtype=float)
+    n = np.asarray(n, dtype=float)
+
+    if groups is None:
+        groups = np.zeros(len(x), dtype=int)
+    groups = np.asarray(groups, dtype=int)
+
+    if n_groups is None:
+        n_groups = groups.max() + 1 if len(groups) else 0
+
+    def per_group(values):
+        return np.bincount(groups, weights=values, minlength=n_groups)
+
+    # Model is written as logit(p) = a + b * x, with k = b and x0 = - a / b
+    a = np.zeros(n_groups)
+    b = np.zeros(n_groups)
+
+    for i in range(max_iterations):
+
+        p = 1 / (1 + np.exp(-(a[groups] + b[groups] * x)))
+
+        residual = hits - n * p
+        w = n * p * (1 - p)
+
+        # Gradient and (negative) Hessian of the penalized log-likelihood, for every group
+        g_a = per_group(residual) - ridge * a
+        g_b = per_group(residual * x) - ridge * b
+
+        h_aa = per_group(w) + ridge
+        h_ab = per_group(w * x)
+        h_bb = per_group(w * x ** 2) + ridge
+
+        det = h_aa * h_bb - h_ab ** 2
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step_a = np.where(det > 0, (h_bb * g_a - h_ab * g_b) / det, 0)
+            step_b = np.where(det > 0, (h_aa * g_b - h_ab * g_a) / det, 0)
+
+        a += step_a
+        b += step_b
+
+        if np.max(np.abs(step_a), initial=0) < tolerance and np.max(np.abs(step_b), initial=0) < tolerance:
+            break
+
+    # A slope needs at least two distinct values of x (with trials) in the group: otherwise the Hessian is singular,
+    # and only the ridge keeps the parameters finite
+    observed = n > 0
+    x_min = np.full(n_groups, np.inf)
+    x_max = np.full(n_groups, -np.inf)
+    np.minimum.at(x_min, groups[observed], x[observed])
+    np.maximum.at(x_max, groups[observed], x[observed])
+    determined = x_max > x_min
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x0 = np.where((b != 0) & determined, - a / b, np.nan)
+    k = np.where(determined, b, np.nan)
+
+    return x0, k
@@ -0,0 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import cpu_count
+from os import makedirs, path
+import hashlib
+import inspect
+import json
+import sys
+
+from utils.utils import log
+from analysis.tools.digest import file_digest
+
+
+"""
+Small dependency graph runner for analysis scripts:
+stages that do not depend on each other are executed concurrently in worker processes,
+and a stage is skipped if its inputs (and its code) did not change since its last successful run
+"""
+
+
+root = path.abspath("{}/../..".format(path.dirname(path.abspath(__file__))))
+
+
+def local_modules(module):
+
+    """
+    :return: files of 'module' and of the modules of the repository it uses (imported modules, and modules
+    defining the functions and classes it imports), recursively
+    """
+
+    files = {}
+    to_visit = [module]
+
+    while to_visit:
+
+        m = to_visit.pop()
+        file_path = getattr(m, "__file__", None)
+        if file_path is None:
+            continue
+
+        file_path = path.abspath(file_path)
+        if file_path in files or not file_path.startswith(root + path.sep) or "site-packages" in file_path:
+            continue
+
+        files[file_path] = m
+
+        for value in vars(m).values():
+            if inspect.ismodule(value):
+                to_visit.append(value)
+            elif inspect.isfunction(value) or inspect.isclass(value):
+                to_visit.append(sys.modules.get(value.__module__))
+
+    return sorted(files)
+
+
+def run_stage(func, kwargs):
+
+    # Executed in a worker process
+    func(**kwargs)
+
+
+class Stage(object):
+
+    def __init__(self, name, func, inputs=(), outputs=(), requires=(), kwargs=None):
+
+        """
+        :param func: module-level function (it has to be picklable), called with 'kwargs'
+        :param inputs: files whose content determines the results of the stage
+        :param outputs: files the stage is expected to produce
+        :param requires: names of the stages that have to be done before this one
+        """
+
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.requires = list(requires)
+        self.kwargs = kwargs if kwargs is not None else {}
+
+    def sources(self):
+
+        # The code of the stage is considered as an input too: the module containing the function,
+        # and the modules of the repository it relies on (e.g. 'analysis/tools/contingency.py')
+        return local_modules(sys.modules[self.func.__module__])
+
+    def digest(self, upstream_digests):
+
+        h = hashlib.sha1()
+        h.update(self.name.encode())
+
+        for file_path in self.sources() + sorted(self.inputs):
+            h.update(file_path.encode())
+            h.update(file_digest(file_path).encode())
+
+        for name in sorted(self.requires):
+            h.update(upstream_digests[name].encode())
+
+        return h.hexdigest()
+
+    def is_up_to_date(self, digest, stamps):
+
+        return stamps.get(self.name) == digest and all(path.exists(i) for i in self.outputs)
+
+
+class Pipeline(object):
+
+    name = "Pipeline"
+
+    def __init__(self, stages, stamps_file, processes=None):
+
+        self.stages = {stage.name: stage for stage in stages}
+        self.stamps_file = stamps_file
+        self.processes = processes if processes is not None else max(1, cpu_count() - 1)
+
+        self.check()
+
+    def check(self):
+
+        for stage in self.stages.values():
+            for name in stage.requires:
+                if name not in self.stages:
+                    raise Exception("{}: Stage '{}' requires unknown stage '{}'.".format(self.name, stage.name, name))
+
+        # Look for cycles by resolving the graph once
+        done = set()
+        remaining = set(self.stages)
+        while remaining:
+            ready = {i for i in remaining if set(self.stages[i].requires) <= done}
+            if not ready:
+                raise Exception("{}: Cycle in dependencies between stages {}.".format(self.name, sorted(remaining)))
+            done |= ready
+            remaining -= ready
+
+    def load_stamps(self):
+
+        try:
+            with open(self.stamps_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_stamps(self, stamps):
+
+        makedirs(path.dirname(self.stamps_file) or ".", exist_ok=True)
+        with open(self.stamps_file, "w") as f:
+            json.dump(stamps, f, indent=2, sort_keys=True)
+
+    def run(self, force=False):
+
+        stamps = self.load_stamps()
+        digests = {}
+
+        done = set()
+        failed = set()
+        running = {}
+
+        pending = set(self.stages)
+
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+
+            while pending or running:
+
+                for name in sorted(pending):
+
+                    stage = self.stages[name]
+
+                    if set(stage.requires) & failed:
+                        log("Stage '{}' not run (a stage it requires failed).".format(name), self.name)
+                        pending.remove(name)
+                        failed.add(name)
+                        continue
+
+                    if not set(stage.requires) <= done:
+                        continue
+
+                    pending.remove(name)
+
+                    # Computed only now, as inputs may have been produced by the stages it requires
+                    digests[name] = stage.digest(digests)
+
+                    if not force and stage.is_up_to_date(digests[name], stamps):
+                        log("Stage '{}' is up to date.".format(name), self.name)
+                        done.add(name)
+                        continue
+
+                    log("Launch stage '{}'.".format(name), self.name)
+                    running[executor.submit(run_stage, stage.func, stage.kwargs)] = name
+
+                if not running:
+                    # Stages skipped during this pass may have released other ones
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+
+                    name = running.pop(future)
+                    e = future.exception()
+
+                    if e is None:
+                        log("Stage '{}' done.".format(name), self.name)
+                        done.add(name)
+                        stamps[name] = digests[name]
+                        self.save_stamps(stamps)
+
+                    else:
+                        log("Stage '{}' failed: {}".format(name, e), self.name)
+                        failed.add(name)
+                        stamps.pop(name, None)
+                        self.save_stamps(stamps)
+
+        if failed:
+            raise Exception("{}: Stage(s) {} failed.".format(self.name, sorted(failed)))
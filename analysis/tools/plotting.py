@@ -0,0 +1,63 @@
+from multiprocessing import Pool, cpu_count
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from utils.utils import log
+
+
+"""
+Render figures without pyplot: every figure is an independent object (Agg canvas, PDF written by the PDF backend),
+so no state is shared between figures and figures can be rendered in parallel worker processes
+"""
+
+
+class FigureJob(object):
+
+    def __init__(self, draw, fig_name, fig_size=None):
+
+        """
+        :param draw: function (it has to be picklable) drawing on the figure given as argument
+        :param fig_name: file in which the figure is saved
+        :param fig_size: size in inches (default size of matplotlib if None)
+        """
+
+        self.draw = draw
+        self.fig_name = fig_name
+        self.fig_size = fig_size
+
+
+def render(job):
+
+    fig = Figure(figsize=job.fig_size)
+    FigureCanvasAgg(fig)
+
+    job.draw(fig)
+    fig.savefig(job.fig_name)
+
+    return job.fig_name
+
+
+class Plotter(object):
+
+    name = "Plotter"
+
+    def __init__(self, processes=None):
+
+        self.processes = processes if processes is not None else max(1, cpu_count() - 1)
+
+    def render(self, jobs):
+
+        jobs = list(jobs)
+
+        if self.processes == 1 or len(jobs) < 2:
+            fig_names = [render(job) for job in jobs]
+
+        else:
+            with Pool(processes=min(self.processes, len(jobs))) as pool:
+                fig_names = pool.map(render, jobs)
+
+        for fig_name in fig_names:
+            log("Figure saved: '{}'.".format(fig_name), self.name)
+
+        return fig_names
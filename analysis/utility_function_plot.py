@@ -1,9 +1,10 @@
-from pylab import np, plt
+import numpy as np
 import os
 import json
 
 from analysis.modelling import ProspectTheoryModel
 from analysis.parameters import parameters
+from analysis.tools.plotting import FigureJob, Plotter, render
 
 
 """
@@ -39,14 +40,14 @@ class UtilityFunctionPlot(object):
         fig_name += ".pdf"
         return fig_name
 
-    def plot(self):
+    def draw(self, fig):
 
         x = np.linspace(self.reward_min, self.reward_max, self.n_points)
         y = [self.model.u(i) for i in x]
 
         x[:] = np.divide(x, self.reward_max)
 
-        ax = plt.gca()
+        ax = fig.add_subplot(111)
         ax.plot(x, y, color="black", linewidth=self.line_width)
 
         ax.spines['left'].set_position(('data', 0))
@@ -62,22 +63,29 @@ class UtilityFunctionPlot(object):
         ax.set_xlabel("$x$", rotation=0, position=(0.9, None), fontsize=self.axis_label_font_size)
         ax.set_ylabel("$u(x)$", rotation=0, position=(None, 0.9), fontsize=self.axis_label_font_size)
 
-        plt.tick_params(axis='both', which='major', labelsize=self.ticks_label_font_size)
-        plt.tick_params(axis='both', which='minor', labelsize=self.ticks_label_font_size)
+        ax.tick_params(axis='both', which='major', labelsize=self.ticks_label_font_size)
+        ax.tick_params(axis='both', which='minor', labelsize=self.ticks_label_font_size)
 
-        plt.xticks([-1, -0.5, 0.5, 1])
-        plt.yticks([-1, -0.5, 0.5, 1])
+        ax.set_xticks([-1, -0.5, 0.5, 1])
+        ax.set_yticks([-1, -0.5, 0.5, 1])
 
         ax.set_aspect(1)
 
-        plt.tight_layout()
+        fig.tight_layout()
+
+    def job(self):
 
-        plt.savefig(fname=self.fig_name)
-        plt.close()
+        return FigureJob(draw=self.draw, fig_name=self.fig_name)
+
+    def plot(self):
+
+        render(self.job())
 
 
 def main():
 
+    jobs = []
+
     for monkey in ["Gladys", "Havane"]:
 
         fit_results = "{}/{}_fit.json".format(parameters.folders["fit"], monkey)
@@ -89,7 +97,9 @@ def main():
             data = json.load(f)
 
         ufp = UtilityFunctionPlot(monkey=monkey, param=data)
-        ufp.plot()
+        jobs.append(ufp.job())
+
+    Plotter().render(jobs)
 
 
 if __name__ == "__main__":
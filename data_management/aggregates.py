@@ -0,0 +1,231 @@
+from collections import OrderedDict
+from statistics import mean, median
+import argparse
+
+from data_management.database import Database
+from utils.utils import log
+
+
+"""
+Per-session aggregates (number of trials, errors by type, counts of hits in the control conditions,
+reaction and movement times, total reward), kept in the table 'aggregates' by the writer
+when a session is saved, so that the progress of a monkey is known from one row per session
+instead of from every trial.
+Use 'python -m data_management.aggregates [--database path]' for computing the aggregates of the sessions saved
+before; sessions without aggregates are still summarized, from their trials (see 'progress').
+"""
+
+
+name = "Aggregates"
+
+# Not prefixed with "session_", which is reserved for the session tables
+aggregate_table_name = "aggregates"
+
+errors = [
+    "release before end of fixation time",
+    "did not release grip to decide",
+    "come back to grip instead of deciding",
+    "too long to take a decision",
+    "did not came back to the grip"
+]
+
+
+def is_best_x0(t):
+
+    return (t["choice"] == "left") == (t["left_x0"] > t["right_x0"])
+
+
+# Control conditions (same as 'analysis/tools/progress_analyst.py'): condition -> (trial is concerned, choice is a hit)
+control_conditions = OrderedDict([
+    ("identical p, negative x0", (
+        lambda t: t["left_p"] == t["right_p"] and t["left_x0"] < 0 and t["right_x0"] < 0, is_best_x0)),
+    ("identical p, positive x0", (
+        lambda t: t["left_p"] == t["right_p"] and t["left_x0"] > 0 and t["right_x0"] > 0, is_best_x0)),
+    ("identical p, positive vs negative x0", (
+        lambda t: t["left_p"] == t["right_p"] and (t["left_x0"] > 0 > t["right_x0"] or t["left_x0"] < 0 < t["right_x0"]),
+        is_best_x0)),
+    ("identical x, negative x0", (
+        lambda t: t["left_x0"] == t["right_x0"] and t["left_x0"] < 0,
+        lambda t: (t["choice"] == "left") == (t["left_p"] < t["right_p"]))),
+    ("identical x, positive x0", (
+        lambda t: t["left_x0"] == t["right_x0"] and t["left_x0"] > 0,
+        lambda t: (t["choice"] == "left") == (t["left_p"] > t["right_p"]))),
+])
+
+
+def to_column_name(label):
+
+    return label.replace(",", "").replace(" ", "_")
+
+
+columns = OrderedDict([
+    ("session_table", str),
+    ("monkey", str),
+    ("date", str),
+    ("n_trials", int),
+    ("n_valid", int),
+])
+for error in errors:
+    columns["n_error_{}".format(to_column_name(error))] = int
+for condition in control_conditions:
+    columns["n_{}".format(to_column_name(condition))] = int
+    columns["hit_{}".format(to_column_name(condition))] = int
+for time_column in ("time_reaction", "time_movement"):
+    columns["mean_{}".format(time_column)] = float
+    columns["median_{}".format(time_column)] = float
+columns["total_reward"] = int
+
+
+def normalize(trial):
+
+    """ Trials saved before the declared schema have their numbers as text, and no error as 'None' """
+
+    trial = dict(trial)
+    if trial["error"] == "None":
+        trial["error"] = None
+    for side in ("left", "right"):
+        trial["{}_p".format(side)] = float(trial["{}_p".format(side)])
+        for key in ("x0", "x1"):
+            trial["{}_{}".format(side, key)] = int(trial["{}_{}".format(side, key)])
+
+    return trial
+
+
+def compute(trials, session_table, monkey, date):
+
+    """
+    :param trials: list of dictionaries, one per trial (see data_management/trial_record.py)
+    :return: row of the aggregate table
+    """
+
+    trials = [normalize(t) for t in trials]
+    valid = [t for t in trials if t["error"] is None]
+
+    row = OrderedDict([
+        ("session_table", session_table), ("monkey", monkey), ("date", date),
+        ("n_trials", len(trials)), ("n_valid", len(valid))
+    ])
+
+    for error in errors:
+        row["n_error_{}".format(to_column_name(error))] = sum(t["error"] == error for t in trials)
+
+    for condition, (is_concerned, is_hit) in control_conditions.items():
+        concerned = [t for t in valid if is_concerned(t)]
+        row["n_{}".format(to_column_name(condition))] = len(concerned)
+        row["hit_{}".format(to_column_name(condition))] = sum(bool(is_hit(t)) for t in concerned)
+
+    for time_column in ("time_reaction", "time_movement"):
+        times = [float(t[time_column]) for t in valid]
+        row["mean_{}".format(time_column)] = mean(times) if times else None
+        row["median_{}".format(time_column)] = median(times) if times else None
+
+    row["total_reward"] = sum(t["{}_x{}".format(t["choice"], int(t["dice_output"]))] for t in valid)
+
+    return row
+
+
+def update(database, trials, session_table, monkey, date):
+
+    """ Save the aggregates of a session (called when the session is saved, see data_management/sessions.py) """
+
+    if not database.table_exists(aggregate_table_name):
+        database.create_table(table_name=aggregate_table_name, columns=columns)
+        database.write("CREATE INDEX IF NOT EXISTS aggregates_monkey_date ON `{}` (monkey, date)"
+                       .format(aggregate_table_name))
+        log("Aggregate table created.", name)
+
+    database.write("DELETE FROM `{}` WHERE session_table=?".format(aggregate_table_name), (session_table, ))
+    database.fill_table(aggregate_table_name, **compute(trials, session_table, monkey, date))
+
+
+def read_trials(db, session_table):
+
+    names = db.get_column_names(session_table)
+    return [dict(zip(names, row)) for row in db.read("SELECT * FROM `{}`".format(session_table))]
+
+
+def rebuild(database_path=None):
+
+    """ Compute the aggregates of every session of the summary table """
+
+    db = Database(database_path)
+
+    names = db.get_column_names("summary")
+    sessions = [dict(zip(names, row)) for row in db.read("SELECT * FROM summary ORDER BY ID")]
+
+    for session in sessions:
+
+        if not db.table_exists(session["session_table"]):
+            log("Session table '{}' not found.".format(session["session_table"]), name, level="warning")
+            continue
+
+        trials = read_trials(db, session["session_table"])
+
+        with db.transaction():
+            update(db, trials, session_table=session["session_table"], monkey=session["monkey"], date=session["date"])
+
+    log("Aggregates of {} sessions computed.".format(len(sessions)), name)
+
+
+def progress(monkey, starting_point, end_point, database_path=None):
+
+    """
+    Success rates in the control conditions, from the aggregate table; sessions without aggregates (saved before
+    the table, or database without it) are summarized from their trials
+    (as 'data_management/data_manager.py', only the last session of every day is considered).
+    :return: dictionary (control condition -> success rate, or None if no trial)
+    """
+
+    db = Database(database_path, read_only=True)
+
+    last_sessions = "SELECT MAX(ID) FROM summary WHERE monkey=? AND date BETWEEN ? AND ? GROUP BY date"
+
+    if db.table_exists(aggregate_table_name):
+        n_and_hits = ", ".join("a.n_{0}, a.hit_{0}".format(to_column_name(c)) for c in control_conditions)
+        query = "SELECT s.session_table, s.date, a.ID, {} FROM summary s LEFT JOIN `{}` a " \
+                "ON a.session_table = s.session_table WHERE s.ID IN ({})".format(
+                    n_and_hits, aggregate_table_name, last_sessions)
+    else:
+        query = "SELECT session_table, date, NULL FROM summary WHERE ID IN ({})".format(last_sessions)
+
+    totals = [0] * (2 * len(control_conditions))
+    n_computed = 0
+
+    for session_table, date, aggregate_id, *n_and_hits in db.read(query, (monkey, starting_point, end_point)):
+
+        if aggregate_id is None:
+            row = compute(read_trials(db, session_table), session_table, monkey, date)
+            n_and_hits = []
+            for condition in control_conditions:
+                n_and_hits += [row["n_{}".format(to_column_name(condition))],
+                               row["hit_{}".format(to_column_name(condition))]]
+            n_computed += 1
+
+        totals = [t + v for t, v in zip(totals, n_and_hits)]
+
+    db.disconnect()
+
+    if n_computed:
+        log("{} sessions without aggregates, summarized from their trials "
+            "(see 'python -m data_management.aggregates').".format(n_computed), name, level="warning")
+
+    rates = OrderedDict()
+    for i, condition in enumerate(control_conditions):
+        n, hit = totals[2 * i], totals[2 * i + 1]
+        rates[condition] = hit / n if n else None
+
+    return rates
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Compute the aggregates of the sessions already saved.")
+    parser.add_argument("--database", help="path of the database (default: see parameters/results_path.json)")
+    args = parser.parse_args()
+
+    rebuild(args.database)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,172 @@
+from os import path, makedirs, replace, getpid
+import json
+import shutil
+
+import numpy as np
+
+from data_management import schema
+from data_management.database import Database
+from utils.utils import log
+
+
+"""
+Export of the trials of a monkey to column-oriented files, for the analysis machines:
+one '.npy' file per column of the session tables (plus 'session', the index of the session of every trial),
+and a 'manifest.json' giving the boundaries of the sessions, their parameters (row of the summary table)
+and the categories of the text columns.
+The files are opened memory-mapped by 'load': no parsing and no copy, and processes share the same pages.
+
+Encoding of the columns:
+- INTEGER columns: int64, NULL being 'missing_int';
+- REAL columns: float64, NULL being NaN;
+- TEXT columns: int16 codes into the categories of the manifest, NULL being -1.
+"""
+
+
+name = "Columnar"
+
+missing_int = np.iinfo(np.int64).min
+
+manifest_name = "manifest.json"
+
+
+def get_default_folder():
+
+    parameters_folder = path.abspath("{}/../parameters".format(path.dirname(path.abspath(__file__))))
+    with open("{}/results_path.json".format(parameters_folder)) as file:
+        return path.expanduser(json.load(file)["columnar_folder"])
+
+
+def encode_column(values, kind, categories):
+
+    if kind is str:
+        codes = {c: i for i, c in enumerate(categories)}
+        for v in values:
+            # Sessions anterior to the declared schema saved NULL as 'None'
+            if v is not None and v != "None" and v not in codes:
+                codes[v] = len(categories)
+                categories.append(v)
+        return np.array([-1 if v is None or v == "None" else codes[v] for v in values], dtype=np.int16)
+
+    elif kind is float:
+        return np.array([np.nan if v is None or v == "None" else float(v) for v in values], dtype=np.float64)
+
+    else:
+        return np.array([missing_int if v is None or v == "None" else int(v) for v in values], dtype=np.int64)
+
+
+def export(monkey, folder=None, database_path=None):
+
+    """
+    Write (or rewrite) the columnar files of a monkey.
+    :return: folder containing them
+    """
+
+    folder = folder if folder is not None else get_default_folder()
+    db = Database(database_path, read_only=True)
+
+    summary_names = db.get_column_names(schema.summary_table_name)
+    summary = [
+        dict(zip(summary_names, row)) for row in db.read(
+            "SELECT * FROM `{}` WHERE monkey=? ORDER BY date, ID".format(schema.summary_table_name), (monkey, ))
+    ]
+
+    columns = {column: [] for column in schema.session_columns}
+    sessions = []
+    n_trials = 0
+
+    for parameters in summary:
+
+        session_table = parameters["session_table"]
+        if not db.table_exists(session_table):
+            log("Session table '{}' not found.".format(session_table), name, level="warning")
+            continue
+
+        existing = set(db.get_column_names(session_table))
+        selected = [c for c in schema.session_columns if c in existing]
+        rows = db.read("SELECT {} FROM `{}` ORDER BY ID".format(", ".join(selected), session_table))
+
+        for i, column in enumerate(selected):
+            columns[column] += [row[i] for row in rows]
+        for column in schema.session_columns:
+            if column not in existing:
+                columns[column] += [None] * len(rows)
+
+        parameters.pop("ID", None)
+        sessions.append({"start": n_trials, "stop": n_trials + len(rows), "parameters": parameters})
+        n_trials += len(rows)
+
+    db.disconnect()
+
+    # Write in a temporary folder first, then swap: processes still using the previous files keep them
+    monkey_folder = "{}/{}".format(folder, monkey)
+    tmp_folder = "{}.{}.tmp".format(monkey_folder, getpid())
+    makedirs(tmp_folder)
+
+    categories = {}
+
+    for column, kind in schema.session_columns.items():
+        if kind is str:
+            categories[column] = []
+        np.save("{}/{}.npy".format(tmp_folder, column), encode_column(columns[column], kind, categories.get(column)))
+
+    session_index = np.empty(n_trials, dtype=np.int32)
+    for i, session in enumerate(sessions):
+        session_index[session["start"]:session["stop"]] = i
+    np.save("{}/session.npy".format(tmp_folder), session_index)
+
+    with open("{}/{}".format(tmp_folder, manifest_name), "w") as file:
+        json.dump({"monkey": monkey, "n_trials": n_trials, "sessions": sessions, "categories": categories,
+                   "missing_int": int(missing_int)}, file)
+
+    if path.exists(monkey_folder):
+        old_folder = "{}.{}.old".format(monkey_folder, getpid())
+        replace(monkey_folder, old_folder)
+        replace(tmp_folder, monkey_folder)
+        shutil.rmtree(old_folder)
+    else:
+        replace(tmp_folder, monkey_folder)
+
+    log("{} trials of {} sessions exported to '{}'.".format(n_trials, len(sessions), monkey_folder), name)
+
+    return monkey_folder
+
+
+def load(monkey, folder=None):
+
+    """
+    :return: dictionary of the columns (read-only memory-mapped arrays), and the manifest
+    """
+
+    folder = folder if folder is not None else get_default_folder()
+    monkey_folder = "{}/{}".format(folder, monkey)
+
+    with open("{}/{}".format(monkey_folder, manifest_name)) as file:
+        manifest = json.load(file)
+
+    columns = {}
+    for column in list(schema.session_columns) + ["session"]:
+        # Empty arrays cannot be memory-mapped
+        columns[column] = np.load("{}/{}.npy".format(monkey_folder, column),
+                                  mmap_mode="r" if manifest["n_trials"] else None)
+
+    return columns, manifest
+
+
+def decode(codes, categories):
+
+    """ :return: values of a text column (None for NULL) """
+
+    lookup = np.array(list(categories) + [None], dtype=object)
+    return lookup[np.asarray(codes)]
+
+
+def main():
+
+    for monkey in ("Havane", "Gladys"):
+        export(monkey)
+
+
+if __name__ == "__main__":
+
+    main()
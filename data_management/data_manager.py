@@ -10,7 +10,7 @@ class DataManager(object):
 
     def __init__(self, monkey, starting_point="2016-12-01", end_point=today(), database_path=None):
 
-        self.db = Database(database_path)
+        self.db = Database(database_path, read_only=True)
         self.monkey = monkey
         self.starting_point = starting_point
         self.end_point = end_point
@@ -92,12 +92,10 @@ class DataManager(object):
 
         for idx, date in enumerate(sorted(dates)):
 
+            # Last session of the day
             session_table = \
                 self.db.read_column(table_name="summary", column_name='session_table',
-                                    monkey=self.monkey, date=date)
-
-            if type(session_table) == list:
-                session_table = session_table[-1]
+                                    monkey=self.monkey, date=date)[-1]
 
             error_session = self.db.read_column(table_name=session_table, column_name="error")
             choice_session = self.db.read_column(table_name=session_table, column_name="choice")
@@ -128,7 +126,8 @@ class DataManager(object):
         new_session = []
         new_date = []
 
-        valid_trials = np.where(np.asarray(error) == "None")[0]
+        # No error is NULL (saved as the text 'None' in the sessions anterior to the declared schema)
+        valid_trials = [i for i, e in enumerate(error) if e is None or e == "None"]
         log("N valid trials: {}.".format(len(valid_trials)), self.name)
 
         for valid_idx in valid_trials:
@@ -167,6 +166,8 @@ class DataManager(object):
 
         assert sum(x1["left"]) == 0 and sum(x1["right"]) == 0
 
+        self.db.disconnect()
+
         log("Done!", self.name)
 
         return {"p": p, "x0": x0, "x1": x1, "choice": choice, "session": session, "date": date}
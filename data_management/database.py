@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from sqlite3 import connect, OperationalError
+from urllib.parse import quote
 import os
 import json
 
@@ -9,7 +11,16 @@ class Database(object):
 
     name = "Database"
 
-    def __init__(self, database_path=None):
+    # Read-only connexions: size of the memory map (bytes) and of the page cache (KiB, negative for SQLite)
+    mmap_size = 256 * 1024 ** 2
+    cache_size = -64 * 1024
+
+    def __init__(self, database_path=None, read_only=False):
+
+        """
+        :param read_only: if True (analysis), the database is opened in read-only mode, with a single connexion
+        kept open, memory-mapped I/O and a larger page cache; no lock for writing is ever taken and nothing is committed
+        """
 
         if database_path is None:
             parameters_folder = os.path.abspath("{}/../parameters".format(os.path.dirname(os.path.abspath(__file__))))
@@ -27,6 +38,11 @@ class Database(object):
         self.connexion = None
         self.cursor = None
 
+        # If True, queries share the connexion opened by 'transaction'
+        self.in_transaction = False
+
+        self.read_only = read_only
+
         self.types = {int: "INTEGER", float: "REAL", str: "TEXT", list: "TEXT"}
 
     def table_exists(self, table_name):
@@ -36,19 +52,21 @@ class Database(object):
         if os.path.exists(self.db_path):
 
             # noinspection SqlResolve
-            already_existing = self.read("SELECT name FROM sqlite_master WHERE type='table'")
+            if self.read("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name, )):
+                r = 1
 
-            if already_existing:
+        return r
 
-                already_existing = [i[0] for i in already_existing]
+    def get_table_names(self, prefix=""):
 
-                if table_name in already_existing:
-                    r = 1
+        """ :return: names of the tables starting with 'prefix', in a single query """
 
-        else:
-            pass
+        if not os.path.exists(self.db_path):
+            return []
 
-        return r
+        # noinspection SqlResolve
+        return [i[0] for i in self.read(
+            "SELECT name FROM sqlite_master WHERE type='table' AND substr(name, 1, ?)=?", (len(prefix), prefix))]
 
     def create_table(self, table_name, columns):
 
@@ -69,30 +87,52 @@ class Database(object):
 
     def fill_table(self, table_name, **kwargs):
 
-        query = "INSERT INTO `{}` (".format(table_name)
-        for i in kwargs.keys():
-            query += "{}, ".format(i)
+        # Values are bound (not formatted in the query): None is saved as NULL, numbers keep their type
+        query = "INSERT INTO `{}` ({}) VALUES({})".format(
+            table_name, ", ".join(kwargs.keys()), ", ".join("?" for _ in kwargs))
 
-        query = query[:-2]
-        query += ") VALUES("
-        for j in kwargs.values():
-            query += '''"{}", '''.format(j)
+        values = [str(v) if type(v) == list else v for v in kwargs.values()]
 
-        query = query[:-2]
-        query += ")"
+        try:
+            self.write(query, values)
+        except OperationalError as e:
+            log("Database: Error with query: {}".format(query), self.name)
+            raise e
+
+    def fill_table_many(self, table_name, rows):
+
+        """ Insert several rows (dictionaries with the same keys) with a single statement """
+
+        if not rows:
+            return
 
+        keys = list(rows[0].keys())
+        query = "INSERT INTO `{}` ({}) VALUES({})".format(table_name, ", ".join(keys), ", ".join("?" for _ in keys))
+
+        self.open()
         try:
-            self.write(query)
+            self.cursor.executemany(query, ([str(v) if type(v) == list else v for v in row.values()] for row in rows))
         except OperationalError as e:
             log("Database: Error with query: {}".format(query), self.name)
             raise e
+        finally:
+            self.close()
+
+    def get_column_names(self, table_name):
 
-    def read(self, query):
+        return [i[1] for i in self.read("PRAGMA table_info(`{}`)".format(table_name))]
+
+    def add_column(self, table_name, column_name, column_type):
+
+        query = "ALTER TABLE `{}` ADD COLUMN {} {}".format(table_name, column_name, self.types.get(column_type, "TEXT"))
+        self.write(query)
+
+    def read(self, query, values=()):
 
         self.open()
 
         try:
-            self.cursor.execute(query)
+            self.cursor.execute(query, values)
         except OperationalError as e:
             log("Database: Error with query: {}".format(query), self.name)
             raise e
@@ -103,24 +143,74 @@ class Database(object):
 
         return content
 
-    def write(self, query):
+    def write(self, query, values=()):
 
         self.open()
-        self.cursor.execute(query)
+        self.cursor.execute(query, values)
         self.close()
 
+    @contextmanager
+    def transaction(self):
+
+        """ Run the queries of the block in a single transaction, the write lock being taken at once """
+
+        self.open()
+
+        try:
+            # May fail (e.g. database locked): the connexion is closed all the same
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self.in_transaction = True
+
+            yield self
+
+        except Exception:
+            self.connexion.rollback()
+            raise
+
+        finally:
+            self.in_transaction = False
+            self.close()
+
     def open(self):
 
+        if self.in_transaction:
+            return
+
+        if self.read_only:
+            if self.connexion is None:
+                self.connect_read_only()
+            self.cursor = self.connexion.cursor()
+            return
+
         # Create connexion to the database
         self.connexion = connect(self.db_path)
         self.cursor = self.connexion.cursor()
 
+    def connect_read_only(self):
+
+        self.connexion = connect("file:{}?mode=ro".format(quote(os.path.abspath(self.db_path))), uri=True)
+        self.connexion.execute("PRAGMA query_only = ON")
+        self.connexion.execute("PRAGMA mmap_size = {}".format(self.mmap_size))
+        self.connexion.execute("PRAGMA cache_size = {}".format(self.cache_size))
+
     def close(self):
 
+        # The read-only connexion stays open (see 'disconnect')
+        if self.in_transaction or self.read_only:
+            return
+
         # Save modifications and close connexion.
         self.connexion.commit()
         self.connexion.close()
 
+    def disconnect(self):
+
+        """ Close the read-only connexion """
+
+        if self.read_only and self.connexion is not None:
+            self.connexion.close()
+            self.connexion = None
+
     def empty(self, table_name):
 
         query = "DELETE from `{}`".format(table_name)
@@ -145,11 +235,5 @@ class Database(object):
 
             query = "SELECT {} from `{}` WHERE {}".format(column_name, table_name, conditions)
 
-        a = self.read(query)
-
-        if a:
-            a = [i[0] for i in a]
-            if len(a) == 1:
-                a = a[0]
-
-        return a
+        # Always a list, even for a single row (e.g. a session of one trial)
+        return [i[0] for i in self.read(query)]
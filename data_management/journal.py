@@ -0,0 +1,269 @@
+from datetime import datetime
+from sqlite3 import OperationalError
+from threading import Thread
+import glob
+import json
+import os
+import socket
+import time
+
+from data_management.sessions import save_session_with_retry
+from data_management.trial_record import TrialRecord
+from utils.channels import Channel
+from utils.utils import log
+
+
+"""
+Write-ahead journal of the sessions: every trial is appended to a JSON-lines file as soon as it is completed,
+by a background thread (flushed and synced to disk), so that a crash or a power loss during a session does not
+lose the trials. Once the session is saved in the database, the journal is marked as such and moved to the
+'archive' subfolder, so that only pending journals are ever read again; journals that are not saved are reconciled into the database at the next start-up (see 'recover'), or by the merge service
+(see data_management/merge.py) when the database could not be reached.
+
+Records: {"kind": "session", "date", "parameters"}, then {"kind": "trial", "trial"} for each trial,
+{"kind": "saved", "session_table"} once saved, and {"kind": "closed"} once the session is over.
+"""
+
+
+# Age after which a claimed journal is considered abandoned, whatever the process that claimed it (s)
+max_claim_age = 600
+
+
+class Journal(Thread):
+
+    name = "Journal"
+
+    def __init__(self, folder, parameters, session_date):
+
+        super().__init__(daemon=True)
+
+        folder = os.path.expanduser(folder)
+        os.makedirs(folder, exist_ok=True)
+
+        self.file_path = "{}/journal_{}_{}.jsonl".format(
+            folder, datetime.now().strftime("%Y_%m_%d_%H_%M_%S_%f"), parameters["monkey"])
+
+        self.records = Channel()
+
+        self.records.put({"kind": "session", "date": session_date, "parameters": parameters})
+
+        self.start()
+
+    def run(self):
+
+        saved = False
+        closed = False
+
+        with open(self.file_path, "a") as file:
+
+            while not closed:
+
+                # Write every record waiting, then sync once
+                records = [self.records.get()]
+                while not self.records.empty():
+                    records.append(self.records.get())
+
+                if None in records:
+                    closed = True
+                    records = records[:records.index(None)]
+
+                if records:
+                    file.write("".join(json.dumps(r, default=to_json) + "\n" for r in records))
+                    file.flush()
+                    os.fsync(file.fileno())
+
+                saved = saved or any(r["kind"] == "saved" for r in records)
+
+        log("Closed '{}'.".format(self.file_path), self.name)
+
+        if saved:
+            archive(self.file_path)
+
+    def append(self, trial):
+
+        self.records.put({"kind": "trial", "trial": trial.to_dict()})
+
+    def mark_as_saved(self, session_table):
+
+        self.records.put({"kind": "saved", "session_table": session_table})
+
+    def close(self):
+
+        """ Write the records waiting, then stop (the thread being a daemon, it would not be waited for at exit) """
+
+        self.records.put({"kind": "closed"})
+        self.records.put(None)
+        self.join()
+
+
+def archive(file_path, archived_name=None):
+
+    """ Move a saved journal to the 'archive' subfolder of its folder """
+
+    archive_folder = "{}/archive".format(os.path.dirname(file_path))
+    os.makedirs(archive_folder, exist_ok=True)
+    os.replace(file_path, "{}/{}".format(archive_folder, archived_name or os.path.basename(file_path)))
+
+
+def to_json(obj):
+
+    # Numpy scalars
+    return obj.item() if hasattr(obj, "item") else str(obj)
+
+
+def read(file_path):
+
+    """ :return: records of a journal (a truncated last line, written during a crash, is ignored) """
+
+    records = []
+    with open(file_path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                log("Incomplete record ignored in '{}'.".format(file_path), Journal.name)
+
+    return records
+
+
+def recover(folder, database=None, closed_only=False):
+
+    """
+    Save in the database the sessions whose journal was not marked as saved, and archive their journals.
+    A journal is claimed (renamed '<journal>.<host>.<pid>.claimed') while being saved, so that several processes
+    can recover the same folder.
+    :param closed_only: if True, ignore the journals of sessions possibly still running
+    :return: names of the session tables created
+    """
+
+    folder = os.path.expanduser(folder)
+
+    release_abandoned_claims(folder)
+
+    session_tables = []
+
+    # Archived journals are in a subfolder: only the pending ones are read
+    for file_path in sorted(glob.glob("{}/journal_*.jsonl".format(folder))):
+
+        # Journal of a session still running: neither claimed (it is being written) nor parsed
+        if closed_only and not is_closed(file_path):
+            continue
+
+        claimed_path = "{}.{}.{}.claimed".format(file_path, socket.gethostname(), os.getpid())
+        try:
+            os.replace(file_path, claimed_path)
+        except FileNotFoundError:
+            # Claimed by another process
+            continue
+
+        # Time of the claim (see 'release_abandoned_claims')
+        os.utime(claimed_path)
+
+        done = False
+
+        try:
+            done, session_table = recover_journal(claimed_path, database=database, closed_only=closed_only)
+            if session_table is not None:
+                session_tables.append(session_table)
+
+        except OperationalError as e:
+            log("Could not recover '{}' ({}), it will be next time.".format(file_path, e), Journal.name,
+                level="error")
+
+        finally:
+            if done:
+                archive(claimed_path, archived_name=os.path.basename(file_path))
+            else:
+                os.replace(claimed_path, file_path)
+
+    return session_tables
+
+
+def release_abandoned_claims(folder):
+
+    """
+    Give back the journals claimed by a process that died while recovering them: the process is known to be dead
+    if it ran on this host, otherwise the claim is released once older than 'max_claim_age'
+    """
+
+    for claimed_path in glob.glob("{}/journal_*.jsonl.*.claimed".format(folder)):
+
+        file_path, claimant = claimed_path[:-len(".claimed")].rsplit(".jsonl.", 1)
+        file_path += ".jsonl"
+        host, _, pid = claimant.rpartition(".")
+
+        try:
+            age = time.time() - os.path.getmtime(claimed_path)
+        except FileNotFoundError:
+            continue
+
+        if age < max_claim_age and not (host == socket.gethostname() and not is_alive(int(pid))):
+            continue
+
+        try:
+            os.replace(claimed_path, file_path)
+            log("Claim of '{}' by {} released.".format(file_path, claimant), Journal.name, level="warning")
+        except FileNotFoundError:
+            # Released by another process, or the recovery just ended
+            pass
+
+
+def is_alive(pid):
+
+    # Signal 0 checks the existence of the process (on Windows, it would send a CTRL+C event instead)
+    if os.name != "posix":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def is_closed(file_path, tail_size=4096):
+
+    """ :return: whether the session of a journal is over, from the end of the file only """
+
+    try:
+        with open(file_path, "rb") as file:
+            file.seek(max(0, os.path.getsize(file_path) - tail_size))
+            tail = file.read().decode(errors="ignore")
+    except FileNotFoundError:
+        return False
+
+    kinds = [json.dumps({"kind": kind}).strip("{}") for kind in ("closed", "saved")]
+    return any(kind in tail for kind in kinds)
+
+
+def recover_journal(file_path, database=None, closed_only=False):
+
+    """ :return: whether the journal is done with (saved now or before, or with no session), and the table created """
+
+    records = read(file_path)
+    kinds = {r["kind"] for r in records}
+
+    if closed_only and "closed" not in kinds and "saved" not in kinds:
+        return False, None
+
+    if not records or records[0]["kind"] != "session" or "saved" in kinds:
+        return True, None
+
+    trials = [TrialRecord.from_dict(r["trial"]) for r in records if r["kind"] == "trial"]
+    session_table = None
+
+    if trials:
+        log("Recover {} trials from '{}'.".format(len(trials), file_path), Journal.name)
+        session_table = save_session_with_retry(parameters=records[0]["parameters"], trials=trials,
+                                                session_date=records[0]["date"], database=database)
+
+    # Start on a new line, in case the last one was truncated
+    with open(file_path, "a") as file:
+        file.write("\n" + json.dumps({"kind": "saved", "session_table": session_table}) + "\n")
+
+    return True, session_table
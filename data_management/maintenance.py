@@ -0,0 +1,109 @@
+from sqlite3 import OperationalError
+import argparse
+import os
+
+from data_management import schema
+from data_management.database import Database
+from utils.utils import log
+
+
+"""
+Maintenance of the results database:
+- 'index': index of the summary table on (monkey, date), used for selecting the sessions of a monkey;
+- 'optimize': ANALYZE (statistics for the query planner) and VACUUM (reclaim the space of removed tables);
+- 'report': number of rows and size of every table;
+- 'check': summary rows pointing to missing session tables, and session tables absent from the summary table.
+Usage: 'python -m data_management.maintenance [index|optimize|report|check|all] [--database path]'.
+"""
+
+
+name = "Maintenance"
+
+
+def create_indexes(db):
+
+    db.write("CREATE INDEX IF NOT EXISTS summary_monkey_date ON `{}` (monkey, date)".format(schema.summary_table_name))
+    log("Index of the summary table on (monkey, date) created.", name)
+
+
+def optimize(db):
+
+    size = os.path.getsize(db.db_path)
+
+    db.write("ANALYZE")
+    db.write("VACUUM")
+
+    log("Database optimized: {:.1f} MB -> {:.1f} MB.".format(size / 1024 ** 2, os.path.getsize(db.db_path) / 1024 ** 2),
+        name)
+
+
+def report(db):
+
+    """ :return: dictionary (table name -> (number of rows, size in bytes or None)) """
+
+    # Sizes need SQLite to be compiled with the 'dbstat' virtual table
+    try:
+        sizes = dict(db.read("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+    except OperationalError:
+        sizes = {}
+
+    tables = {}
+    for table_name in db.get_table_names():
+        n_rows = db.read("SELECT COUNT(*) FROM `{}`".format(table_name))[0][0]
+        tables[table_name] = n_rows, sizes.get(table_name)
+
+    for table_name, (n_rows, size) in sorted(tables.items(), key=lambda x: -(x[1][1] or 0)):
+        log("Table '{}': {} rows, {}.".format(
+            table_name, n_rows, "{:.1f} kB".format(size / 1024) if size is not None else "size unknown"), name)
+
+    log("{} tables, {:.1f} MB.".format(len(tables), os.path.getsize(db.db_path) / 1024 ** 2), name)
+
+    return tables
+
+
+def check(db):
+
+    """ :return: session tables missing (referenced by the summary table), and orphan session tables """
+
+    referenced = {i[0] for i in db.read("SELECT session_table FROM `{}`".format(schema.summary_table_name))}
+    existing = set(db.get_table_names(prefix="session_"))
+
+    missing = sorted(referenced - existing)
+    orphans = sorted(existing - referenced)
+
+    for table_name in missing:
+        log("Session table '{}' referenced in the summary table but missing.".format(table_name), name,
+            level="warning")
+
+    for table_name in orphans:
+        log("Session table '{}' not referenced in the summary table.".format(table_name), name, level="warning")
+
+    log("{} sessions checked: {} missing, {} orphans.".format(len(referenced), len(missing), len(orphans)), name)
+
+    return missing, orphans
+
+
+def main():
+
+    commands = {"index": create_indexes, "optimize": optimize, "report": report, "check": check}
+
+    parser = argparse.ArgumentParser(description="Maintenance of the results database.")
+    parser.add_argument("command", choices=sorted(commands) + ["all"], nargs="?", default="all")
+    parser.add_argument("--database", help="path of the database (default: see parameters/results_path.json)")
+    args = parser.parse_args()
+
+    db = Database(args.database)
+
+    if not os.path.exists(db.db_path):
+        raise Exception("{}: No database at '{}'.".format(name, db.db_path))
+
+    if args.command == "all":
+        for command in ("check", "index", "optimize", "report"):
+            commands[command](db)
+    else:
+        commands[args.command](db)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,69 @@
+from os import path
+import glob
+import json
+import time
+
+from data_management import journal
+from data_management.database import Database
+from utils.utils import log
+
+
+"""
+Merge service, for several rigs recording at the same time: every rig journals its sessions in its own folder
+('<journal_folder>/<host name>', see data_management/journal.py). The sessions a rig could not save itself
+(database locked by another rig or by the synchronization client, drive unreachable...) are ingested
+by this service into the central database, one transaction per session.
+Run it on the machine holding the central database: 'python -m data_management.merge'.
+"""
+
+
+name = "Merge"
+
+
+def get_journal_folder():
+
+    parameters_folder = path.abspath("{}/../parameters".format(path.dirname(path.abspath(__file__))))
+    with open("{}/results_path.json".format(parameters_folder)) as file:
+        return path.expanduser(json.load(file)["journal_folder"])
+
+
+def merge(journal_folder=None, database_path=None):
+
+    """
+    Ingest the closed sessions not yet saved, from the journals of every rig.
+    :return: names of the session tables created
+    """
+
+    journal_folder = journal_folder if journal_folder is not None else get_journal_folder()
+    database = Database(database_path)
+
+    session_tables = []
+
+    for rig_folder in sorted(glob.glob("{}/*/".format(journal_folder))):
+
+        # Sessions still running, or interrupted by a crash, are left to the rig (see 'Manager.run');
+        # saved journals are archived (see data_management/journal.py), so a pass only reads the pending ones
+        tables = journal.recover(rig_folder, database=database, closed_only=True)
+        if tables:
+            log("{} sessions merged from '{}': {}.".format(len(tables), rig_folder, tables), name)
+
+        session_tables += tables
+
+    return session_tables
+
+
+def run(period=60, journal_folder=None, database_path=None):
+
+    while True:
+        merge(journal_folder=journal_folder, database_path=database_path)
+        time.sleep(period)
+
+
+def main():
+
+    run()
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+from data_management import trial_record
+
+
+"""
+Declared schema of the tables of the results database.
+Every column has a proper type (INTEGER, REAL or TEXT), missing values are saved as NULL,
+and the range parameters ([min, max], e.g. 'fixation_time') are saved as two INTEGER columns ('<name>_min'
+and '<name>_max') instead of a text to parse.
+"""
+
+
+summary_table_name = "summary"
+
+
+class Range(object):
+
+    """ Type of the parameters given as [min, max] """
+
+    suffixes = ("_min", "_max")
+
+
+# Summary table: one row per session, with the parameters of the session
+summary_columns = OrderedDict([
+    ("date", str),
+    ("session_table", str),
+    ("monkey", str),
+    ("fake", bool),
+    ("trials_per_block", int),
+    ("initial_stock", int),
+    ("reward_time", int),
+    ("valve_opening_time", int),
+    ("fixation_time", Range),
+    ("max_decision_time", int),
+    ("max_return_time", int),
+    ("result_display_time", int),
+    ("inter_trial_time", Range),
+    ("inter_block_time", Range),
+    ("punishment_time", int),
+    ("control_trials_proportion", int),
+    ("with_losses_proportion", int),
+    ("incongruent_proportion", int),
+])
+
+# Session tables: one row per trial
+session_columns = trial_record.columns
+
+
+def get_sql_columns(columns):
+
+    """ :return: columns as created in the database (name -> int, float or str) """
+
+    sql_columns = OrderedDict()
+
+    for column, kind in columns.items():
+
+        if kind is Range:
+            for suffix in Range.suffixes:
+                sql_columns[column + suffix] = int
+
+        elif kind is bool:
+            sql_columns[column] = int
+
+        else:
+            sql_columns[column] = kind
+
+    return sql_columns
+
+
+def encode(columns, values):
+
+    """
+    :param values: dictionary of values, keys being the declared columns (missing ones are saved as NULL)
+    :return: row as filled in the database (name -> value)
+    """
+
+    row = OrderedDict()
+
+    for column, kind in columns.items():
+
+        value = values.get(column)
+
+        if kind is Range:
+            for suffix, v in zip(Range.suffixes, value if value is not None else (None, None)):
+                row[column + suffix] = v
+
+        elif value is None:
+            row[column] = None
+
+        else:
+            row[column] = kind(value) if kind is not bool else int(value)
+
+    return row
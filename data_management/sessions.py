@@ -0,0 +1,183 @@
+from concurrent.futures import Future
+from sqlite3 import OperationalError
+from threading import Thread
+import random
+import time
+
+from data_management import aggregates, schema
+from data_management.database import Database
+from utils.channels import Channel
+from utils.utils import log
+
+
+"""
+Saving of a whole session in the database: one row in the summary table, one table for the trials.
+'SessionWriter' does it in a background thread, so that the end of a session never blocks the Manager.
+"""
+
+
+name = "Sessions"
+
+summary_table_name = schema.summary_table_name
+
+
+def find_session_table_name(database, session_date, monkey):
+
+    """ :return: 'session_<date>_<monkey>', or 'session_<date>_<monkey>(n)' if already taken (n >= 2) """
+
+    session_table_name = "session_{}_{}".format(session_date.replace("-", "_"), monkey)
+
+    # All the names already taken, in one query
+    existing = set(database.get_table_names(prefix=session_table_name))
+
+    if session_table_name in existing:
+
+        log("Session table with name {} already exists.".format(session_table_name), name)
+
+        idx = 2
+        while "{}({})".format(session_table_name, idx) in existing:
+            idx += 1
+        session_table_name = "{}({})".format(session_table_name, idx)
+
+    return session_table_name
+
+
+def save_session(parameters, trials, session_date, database=None):
+
+    """
+    :param parameters: parameters of the session (without the 'save' entry)
+    :param trials: list of 'TrialRecord', one per trial
+    :param session_date: date of the session ('YYYY-MM-DD')
+    :return: name of the session table
+    """
+
+    database = database if database is not None else Database()
+
+    summary_columns = schema.get_sql_columns(schema.summary_columns)
+
+    unknown = set(parameters) - set(schema.summary_columns)
+    if unknown:
+        log("Parameters not in the schema of the summary table (not saved): {}.".format(sorted(unknown)), name,
+            level="warning")
+
+    # All or nothing: a session interrupted by an error (e.g. database locked by another rig) leaves no trace
+    with database.transaction():
+
+        # Verify if a summary table exists, otherwise, create it
+        if not database.table_exists(summary_table_name):
+
+            database.create_table(
+                table_name=summary_table_name,
+                columns=summary_columns)
+
+            log("Summary table created.", name)
+
+        else:
+            log("Summary table already exists.", name)
+
+            # Summary tables created before the declared schema lack some of its columns
+            existing = database.get_column_names(summary_table_name)
+            for column, kind in summary_columns.items():
+                if column not in existing:
+                    log("Add column '{}' to summary table.".format(column), name)
+                    database.add_column(summary_table_name, column, kind)
+
+        # Create a session table
+        log("Create session table.", name)
+        session_table_name = find_session_table_name(database, session_date, parameters["monkey"])
+
+        database.create_table(
+            table_name=session_table_name,
+            columns=schema.get_sql_columns(schema.session_columns)
+        )
+
+        log("Session table created with name {}.".format(session_table_name), name)
+
+        # Fill summary table
+        database.fill_table(summary_table_name, **schema.encode(
+            schema.summary_columns, dict(parameters, date=session_date, session_table=session_table_name)))
+
+        # Fill session table
+        rows = [schema.encode(schema.session_columns, trial.to_dict()) for trial in trials]
+        database.fill_table_many(session_table_name, rows)
+
+        aggregates.update(database, rows, session_table=session_table_name, monkey=parameters["monkey"],
+                          date=session_date)
+
+    return session_table_name
+
+
+def save_session_with_retry(parameters, trials, session_date, database=None, attempts=6, delay=0.5, max_delay=30):
+
+    """
+    Same as 'save_session', retried with an exponential backoff (and jitter, so that rigs retrying at the same time
+    do not collide again) as long as the database is locked or unreachable
+    """
+
+    for attempt in range(attempts):
+
+        try:
+            return save_session(parameters=parameters, trials=trials, session_date=session_date, database=database)
+
+        except OperationalError as e:
+
+            if attempt == attempts - 1:
+                raise e
+
+            wait = min(delay * 2 ** attempt, max_delay) * (1 + random.random() / 2)
+            log("Saving failed ({}), retry in {:.1f} s.".format(e, wait), name, level="warning")
+            time.sleep(wait)
+
+
+class SessionWriter(Thread):
+
+    """ Save the sessions one after the other, in the order in which they were submitted """
+
+    name = "SessionWriter"
+
+    def __init__(self, database=None):
+
+        super().__init__(daemon=True)
+
+        self.database = database
+        self.jobs = Channel()
+
+    def run(self):
+
+        while True:
+
+            job = self.jobs.get()
+            if job is None:
+                break
+
+            future, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(save_session_with_retry(database=self.database, **kwargs))
+
+            except Exception as e:
+                log("Saving of the session failed: {}".format(e), self.name, level="error")
+                future.set_exception(e)
+
+        log("I'm dead.", self.name)
+
+    def submit(self, parameters, trials, session_date):
+
+        """ :return: future whose result is the name of the session table """
+
+        future = Future()
+        self.jobs.put((future, {"parameters": parameters, "trials": trials, "session_date": session_date}))
+        return future
+
+    def pending(self):
+
+        return self.jobs.qsize()
+
+    def end(self):
+
+        """ Save the sessions still waiting, then stop """
+
+        self.jobs.put(None)
+        self.join()
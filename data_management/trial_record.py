@@ -0,0 +1,81 @@
+from collections import OrderedDict
+
+
+"""
+Fixed schema of the trials: the same columns, with the same types, for every session.
+It is used both for accumulating the trials in memory (one 'TrialRecord' per trial) and for creating the session
+tables, instead of deriving the column types from the values of the first trial.
+"""
+
+
+# Column -> type; None is accepted for every column (e.g. no error, no choice)
+columns = OrderedDict([
+    ("error", str),
+    ("choice", str),
+    ("dice_output", int),
+    ("gauge_level", int),
+    ("n_trial_inside_block", int),
+    ("n_block", int),
+    ("time_reaction", int),
+    ("time_movement", int),
+    ("time_back_movement", int),
+    ("time_inter_trial", int),
+    ("time_inter_block", int),
+    ("time_fixation", int),
+    ("time_stamp_grip_onset", int),
+    ("time_stamp_release_grip", int),
+    ("time_stamp_cue_onset", int),
+    ("time_stamp_cue_contact", int),
+    ("time_stamp_result_period_onset", int),
+    ("time_stamp_reward_period_onset", int),
+    ("time_stamp_inter_block_interval_onset", int),
+    ("time_stamp_inter_trial_interval_onset", int),
+    ("left_p", float),
+    ("left_x0", int),
+    ("left_x1", int),
+    ("left_beginning_angle", int),
+    ("right_p", float),
+    ("right_x0", int),
+    ("right_x1", int),
+    ("right_beginning_angle", int),
+])
+
+# Times are given in seconds, and saved in milliseconds
+time_columns = frozenset(column for column in columns if column.startswith("time_"))
+
+
+class TrialRecord(object):
+
+    __slots__ = tuple(columns)
+
+    def __init__(self, **values):
+
+        """ :param values: value of every column of the schema, times being in seconds """
+
+        for column, kind in columns.items():
+
+            value = values[column]
+
+            if column in time_columns:
+                value = int(value * 1000)
+
+            # Numpy scalars are converted as well
+            elif value is not None:
+                value = kind(value)
+
+            setattr(self, column, value)
+
+    @classmethod
+    def from_dict(cls, values):
+
+        """ :param values: value of every column of the schema, as saved (times in milliseconds) """
+
+        record = cls.__new__(cls)
+        for column in columns:
+            setattr(record, column, values[column])
+
+        return record
+
+    def to_dict(self):
+
+        return OrderedDict((column, getattr(self, column)) for column in columns)
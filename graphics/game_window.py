@@ -2,11 +2,13 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtMultimedia import *
 from collections import OrderedDict
-from multiprocessing import Queue, Event
+from threading import Event
 import sys
 from os import path
-from time import time
+from time import perf_counter
 
+from utils.channels import get_channels
+from utils.tracing import tracer
 from utils.utils import log
 from graphics.generic import Frame
 from graphics.gauge import Gauge
@@ -84,11 +86,9 @@ class GameWindow(QMainWindow):
 
     def play_sound(self, sound):
         
-        a = time()
-        self.players[self.current_player].setMedia(self.sounds[sound])
-        b = time()
-        log("Time for setting the sound player: {}.".format(b-a), self.name)
-        self.players[self.current_player].play()
+        with tracer.span("sound_start"):
+            self.players[self.current_player].setMedia(self.sounds[sound])
+            self.players[self.current_player].play()
         self.current_player = (self.current_player + 1) % 6
 
 # ------------------------------------------------------ INITIALIZE ------------------------------------------------ #
@@ -336,7 +336,7 @@ class GameWindow(QMainWindow):
             if not event.isAutoRepeat():
                 log("PRESS 'P'.", self.name)
 
-                self.fake_grip_queue.put(1)
+                self.fake_grip_queue.put((1, perf_counter()))
                 self.fake_grip_value.value = 1
 
         elif self.control_modifier and event.key() == Qt.Key_F:
@@ -351,7 +351,7 @@ class GameWindow(QMainWindow):
 
         elif self.fake_grip_queue and event.key() == Qt.Key_P:
 
-            self.fake_grip_queue.put(0)
+            self.fake_grip_queue.put((0, perf_counter()))
             self.fake_grip_value.value = 0
 
 # ----------------------------------------- RESIZE EVENT ------------------------------------------------ #
@@ -402,7 +402,7 @@ class Viewer(object):
     def __init__(self):
 
         self.window = GameWindow(
-            queues={"manager": Queue(), "interface": Queue()},
+            queues=get_channels(),
             textures_folder=self.textures_folder, standalone=True
         )
 
@@ -1,6 +1,6 @@
 import json
 import sys
-from multiprocessing import Queue, Event
+from threading import Event
 from os import path
 
 from PyQt5.QtWidgets import QWidget, QGridLayout, QPushButton, QMessageBox, QApplication
@@ -9,6 +9,8 @@ from graphics.parametrisation import ParametersContainer
 from graphics.progression_bar import ProgressionBar
 from graphics.trial_counter import TrialCounter
 from graphics.game_window import GameWindow
+from utils.channels import get_channels
+from utils.tracing import tracer
 from utils.utils import log
 from graphics.generic import Communicant
 
@@ -159,8 +161,17 @@ class Interface(QWidget):
 
     def look_for_msg(self):
 
-        message = self.queues["interface"].get()
-        self.handle_message(message)
+        message, t = self.queues["interface"].get_stamped()
+
+        # From the instruction of the Manager to its handling by the Qt thread
+        tracer.record("qt_signal", t)
+
+        # Stimuli and results are painted synchronously ('repaint')
+        if message[0] in ("show_stimuli", "show_results", "show_choice"):
+            with tracer.span("paint:{}".format(message[0])):
+                self.handle_message(message)
+        else:
+            self.handle_message(message)
 
     def handle_message(self, message):
 
@@ -273,7 +284,7 @@ if __name__ == "__main__":
 
     app = QApplication(sys.argv)
     c = Communicant()
-    q = {"graphic": Queue(), "manager": Queue()}
+    q = get_channels()
     s = Event()
     window = Interface(queues=q, communicant=c, shutdown=s)
     window.show()
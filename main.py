@@ -1,6 +1,7 @@
 # coding=utf-8
+import json
 import sys
-from multiprocessing import Queue, Value, Event
+from threading import Event
 
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QApplication
@@ -8,11 +9,17 @@ from PyQt5.QtWidgets import QApplication
 from graphics.interface import Interface
 from graphics.generic import Communicant
 from task.experimentalist import Manager
+from utils.channels import get_channels
+from utils.logger import logger
 from utils.utils import git_report
 
 
 if __name__ == "__main__":
 
+    # Write the logs in rotating files, besides the console
+    with open("parameters/results_path.json") as file:
+        logger.configure(folder=json.load(file)["logs_folder"])
+
     # Make a log of git status
     git_report()
 
@@ -21,12 +28,8 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("textures/monkey.png"))
 
-    queues = {
-        "manager": Queue(),
-        "interface": Queue(),
-        "grip_queue": Queue(),
-        "grip_value": Value('i', 0)
-    }
+    # Every component lives in this process: threads communicate through in-process channels
+    queues = get_channels()
 
     shutdown = Event()
     communicant = Communicant()
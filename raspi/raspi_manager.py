@@ -1,7 +1,9 @@
 import serial as sr
 from multiprocessing import Event, Process, Queue
-from time import time
+from threading import Lock
+from time import time, monotonic_ns
 import socket
+import struct
 import RPi.GPIO as GPIO
 
 """
@@ -47,27 +49,53 @@ class TtlSignal(Process):
         self.queue.put(None)
 
 
-class Valve:
+class Valve(Process):
+
+    """
+    Open the valve in a process of its own (as 'TtlSignal'): the receiving loop is not blocked
+    for the opening time, and frames received meanwhile (TTL, clock synchronizations) are answered at once
+    """
 
     def __init__(self):
 
+        super().__init__()
+        self.queue = Queue()
+        self.shutdown = Event()
+
         self.serial_port = "/dev/ttyUSB0"
-        self.ser = sr.Serial(self.serial_port)
 
-        self.timer = Event()
+        self.start()
 
-    def launch(self, open_time):
+    def _open(self, ser, open_time):
 
         a = time()
-        self.ser.write("S11".encode())
-        self.timer.wait(timeout=open_time/1000.)
-        self.ser.write("S10".encode())
+        ser.write("S11".encode())
+        Event().wait(timeout=open_time/1000.)
+        ser.write("S10".encode())
         b = time()
         print("Open time of valve:", b-a)
 
+    def run(self):
+
+        # Serial port is opened by the process using it
+        ser = sr.Serial(self.serial_port)
+
+        while not self.shutdown.is_set():
+
+            open_time = self.queue.get()
+            if open_time is not None:
+                self._open(ser, open_time)
+
+        ser.close()
+
+    def launch(self, open_time):
+
+        self.queue.put(open_time)
+
     def close(self):
 
-        self.ser.close()
+        self.shutdown.set()
+        self.queue.put(None)
 
 
 class Grip:
@@ -84,6 +112,106 @@ class Grip:
         print("Grip state:", grip_state)
         return grip_state
 
+    def watch(self, callback):
+
+        # Callback is called from a thread of RPi.GPIO on every edge of the signal
+        GPIO.add_event_detect(self.gpio_in, GPIO.BOTH, callback=lambda channel: callback())
+
+    def unwatch(self):
+
+        GPIO.remove_event_detect(self.gpio_in)
+
+
+# ------------------ Protocol (copy of the definitions of task/protocol.py: keep them identical) ------------------ #
+
+frame = struct.Struct("<BIiq")
+
+VALVE = 1
+TTL = 2
+GRIP_SUBSCRIBE = 3
+SYNC = 4
+
+GRIP_STATE = 16
+SYNC_REPLY = 17
+ACK = 18
+
+
+class Sender:
+
+    """ Frames are sent both from the main loop and from the thread of RPi.GPIO """
+
+    def __init__(self, conn):
+
+        self.conn = conn
+        self.lock = Lock()
+        self.seq = 0
+
+    def send(self, kind, value=0, time_stamp=0, seq=None):
+
+        with self.lock:
+
+            if seq is None:
+                self.seq = (self.seq + 1) & 0xFFFFFFFF
+                seq = self.seq
+
+            try:
+                self.conn.sendall(frame.pack(kind, seq, value, time_stamp))
+            except OSError as e:
+                print("Could not send frame: {}".format(e))
+
+
+class GripStreamer:
+
+    """
+    Push grip transitions to the client as soon as they happen,
+    with the time of the transition (monotonic clock of the RPi, in ns).
+    """
+
+    def __init__(self, grip, sender):
+
+        self.grip = grip
+        self.sender = sender
+        self.lock = Lock()
+        self.state = None
+
+    def start(self):
+
+        self.grip.watch(self.on_edge)
+
+        # Send the current state, for the client to be up to date
+        self.on_edge()
+
+    def on_edge(self):
+
+        t = monotonic_ns()
+        grip_state = 1 - GPIO.input(self.grip.gpio_in)
+
+        with self.lock:
+
+            # Ignore bounces of the signal that did not change the state
+            if grip_state == self.state:
+                return
+
+            self.state = grip_state
+
+            self.sender.send(GRIP_STATE, value=grip_state, time_stamp=t)
+
+    def stop(self):
+
+        self.grip.unwatch()
+
+
+def recv_exactly(conn, n):
+
+    data = b""
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            return b""
+        data += chunk
+
+    return data
+
 
 def main():
 
@@ -107,23 +235,36 @@ def main():
 
                 with conn:
 
+                    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
                     print("Connected by '{}'.".format(addr))
+
+                    sender = Sender(conn)
+                    grip_streamer = None
+
                     while True:
 
                         try:
-                            data = conn.recv(5)  # Go signal
+                            data = recv_exactly(conn, frame.size)
                             if data:
-                                data = data.decode()
-                                if data[0] == "v":
-                                    aperture = int(data[1:].replace("*", ""))
-                                    valve.launch(aperture)
+                                t = monotonic_ns()
+                                kind, seq, value, time_stamp = frame.unpack(data)
 
-                                elif data[0] == "g":
-                                    detector_state = grip.detect()
-                                    conn.send("{}".format(detector_state).encode())
+                                if kind == SYNC:
+                                    sender.send(SYNC_REPLY, time_stamp=t, seq=seq)
 
-                                elif data[0] == "s":
+                                elif kind == VALVE:
+                                    sender.send(ACK, time_stamp=t, seq=seq)
+                                    valve.launch(value)
+
+                                elif kind == GRIP_SUBSCRIBE:
+                                    if grip_streamer is None:
+                                        grip_streamer = GripStreamer(grip=grip, sender=sender)
+                                        grip_streamer.start()
+
+                                elif kind == TTL:
                                     ttl_signal.send()
+                                    sender.send(ACK, time_stamp=t, seq=seq)
 
                                 else:
                                     print("Message not understood: '{}'.".format(data))
@@ -135,6 +276,9 @@ def main():
                             print(e)
                             break
 
+                    if grip_streamer is not None:
+                        grip_streamer.stop()
+
     except (SystemExit, KeyboardInterrupt, Exception) as e:
         print("Got exception '{}' and will exit.".format(e))
 
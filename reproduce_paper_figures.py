@@ -2,20 +2,64 @@ import os
 
 from utils import utils
 import analysis
+from analysis.tools.pipeline import Stage, Pipeline
 
 
-assert os.path.exists(analysis.parameters.database_path), \
-    "Fatal: Could not find the database containing behavioral results! \n" \
-    "Please take a look at the analysis parameters (analysis/parameters/parameters.py)."
+def get_pipeline():
 
-analysis.modelling.main()
-analysis.control_trials.main()
-analysis.exemplary_case.main()
-analysis.preference_towards_risk_against_expected_value.main()
-analysis.main_figures.main()
+    parameters = analysis.parameters
+    monkeys = ["Havane", "Gladys"]
 
-utils.log("Done!", name="Reproduce paper figures")
-utils.log("Path of the figures: {}".format(os.getcwd() + os.sep + analysis.parameters.folders["figures"]),
-          name="Reproduce paper figures")
+    # Every stage depends on the experimental data and on the analysis settings
+    common_inputs = [parameters.database_path, parameters.parameters.__file__]
 
+    fit = ["{}/{}_fit.json".format(parameters.folders["fit"], monkey) for monkey in monkeys]
 
+    def figures(name, suffixes=("", )):
+        return ["{}/{}_{}{}.pdf".format(parameters.folders["figures"], monkey, name, suffix)
+                for monkey in monkeys for suffix in suffixes]
+
+    stages = [
+        Stage(
+            name="modelling", func=analysis.modelling.main,
+            inputs=common_inputs,
+            outputs=fit),
+        Stage(
+            name="control_trials", func=analysis.control_trials.main,
+            inputs=common_inputs,
+            outputs=figures("control_trials")),
+        Stage(
+            name="exemplary_case", func=analysis.exemplary_case.main,
+            inputs=common_inputs,
+            outputs=figures("equal_expected_value")),
+        Stage(
+            name="preference_towards_risk_against_expected_value",
+            func=analysis.preference_towards_risk_against_expected_value.main,
+            inputs=common_inputs,
+            outputs=figures("preference_towards_risk_against_expected_value",
+                            suffixes=("_with_gains_only", "_with_losses_only"))),
+        Stage(
+            name="main_figures", func=analysis.main_figures.main,
+            inputs=fit,
+            requires=["modelling"])
+    ]
+
+    return Pipeline(stages=stages, stamps_file="{}/pipeline.json".format(parameters.folder_path))
+
+
+def main(force=False):
+
+    assert os.path.exists(analysis.parameters.database_path), \
+        "Fatal: Could not find the database containing behavioral results! \n" \
+        "Please take a look at the analysis parameters (analysis/parameters/parameters.py)."
+
+    get_pipeline().run(force=force)
+
+    utils.log("Done!", name="Reproduce paper figures")
+    utils.log("Path of the figures: {}".format(os.getcwd() + os.sep + analysis.parameters.folders["figures"]),
+              name="Reproduce paper figures")
+
+
+if __name__ == "__main__":
+
+    main()
@@ -1,15 +1,22 @@
-from collections import OrderedDict
-from datetime import date
+from datetime import date, datetime
+from functools import partial
 from threading import Event, Thread
+import asyncio
 import time
 import json
+import socket
 from os import path
+import os
 import numpy as np
 
-from data_management.database import Database
+from data_management import journal, sessions
+from data_management.trial_record import TrialRecord
 from task.ressources import GripManager, ValveManager, TtlManager, \
-    GripTracker, Timer, Client, GaugeAnimation
+    GripTracker, Timer, Transport, GaugeAnimation, QueueListener
+from task.scheduling import PrecisionScheduler
+from task.state_machine import StateMachine, ANY
 from task.stimuli_finder import StimuliFinder
+from utils.tracing import tracer
 from utils.utils import log
 
 
@@ -17,7 +24,13 @@ class Manager(Thread):
 
     name = "Manager"
 
-    def __init__(self, communicant, queues, shutdown):
+    def __init__(self, communicant, queues, shutdown, virtual_clock=None, rpi_address=None):
+
+        """
+        :param virtual_clock: if given (see task/simulation.py), time does not flow by itself
+        but jumps from one event to the next
+        :param rpi_address: (ip address, port) of the RPi, instead of the one of 'parameters/raspberry_pi.json'
+        """
 
         super().__init__()
 
@@ -25,26 +38,42 @@ class Manager(Thread):
         self.shutdown = shutdown
         self.communicant = communicant
 
-        self.grip_tracker = GripTracker(
-            message_queue=self.queues["manager"],
-            change_queue=self.queues["grip_queue"]
-        )
+        # Every message, timer and change of grip state is handled by this event loop, run by the Manager thread
+        if virtual_clock is None:
+            self.loop = asyncio.new_event_loop()
+            self.clock = time.perf_counter
+            self.scheduler = PrecisionScheduler(loop=self.loop)
+
+        else:
+            self.loop = virtual_clock.new_event_loop()
+            self.clock = virtual_clock.time
+            self.scheduler = PrecisionScheduler(loop=self.loop, clock=virtual_clock.time_ns, spin_time=0)
+
+        self.message_listener = QueueListener(
+            queue=self.queues["manager"], loop=self.loop, callback=self.receive_message, stage="manager_queue")
+
+        self.grip_tracker = GripTracker(deliver=self.receive_message, clock=self.clock)
+
+        self.grip_listener = QueueListener(
+            queue=self.queues["grip_queue"], loop=self.loop, callback=self.grip_tracker.change, stage="grip_queue")
 
         # --------- PROCESS FOR GRIP AND VALVE --- #
 
         # Get IP address of the RPi
-        parameters_folder = path.abspath("{}/../parameters".format(path.dirname(path.abspath(__file__))))
-        with open("{}/raspberry_pi.json".format(parameters_folder)) as file:
-            rpi_parameters = json.load(file)
+        if rpi_address is None:
+            parameters_folder = path.abspath("{}/../parameters".format(path.dirname(path.abspath(__file__))))
+            with open("{}/raspberry_pi.json".format(parameters_folder)) as file:
+                rpi_parameters = json.load(file)
+            rpi_address = rpi_parameters["ip_address"], rpi_parameters["port"]
 
-        self.client = Client(ip_address=rpi_parameters["ip_address"], port=rpi_parameters["port"])
+        self.transport = Transport(ip_address=rpi_address[0], port=rpi_address[1])
 
         self.grip_manager = GripManager(
             grip_value=self.queues["grip_value"], grip_queue=self.queues["grip_queue"],
-            client=self.client)
+            transport=self.transport)
 
-        self.valve_manager = ValveManager(client=self.client)
-        self.ttl_manager = TtlManager(client=self.client)
+        self.valve_manager = ValveManager(transport=self.transport)
+        self.ttl_manager = TtlManager(transport=self.transport)
 
         # -------- PARAMETERS --------- #
 
@@ -63,18 +92,18 @@ class Manager(Thread):
 
         self.stimuli_parameters = {}
         self.to_save = []
+        self.journal = None
         self.error = None
 
         self.dice_output = 0
 
-        self.current_saving = Event()
-        self.data_saved = Event()
+        self.session_writer = sessions.SessionWriter()
         self.waiting_event = Event()
 
         # -------- TIME & TIMERS ----------- #
 
-        self.timer = Timer(message_queue=self.queues["manager"])
-        self.gauge_animation = GaugeAnimation(message_queue=self.queues["manager"])
+        self.timer = Timer(scheduler=self.scheduler, deliver=self.receive_message)
+        self.gauge_animation = GaugeAnimation(scheduler=self.scheduler, deliver=self.receive_message)
 
         self.time_reference = -1
 
@@ -103,7 +132,8 @@ class Manager(Thread):
         self.n_block = 0
 
         # ------ STATE MANAGEMENT ---- #
-        self.state = ""
+        self.state_machine = StateMachine(
+            states=self.states, transitions=self.get_transitions(), clock=self.clock, initial_state="")
 
         # ------ INIT ------ #
 
@@ -113,35 +143,48 @@ class Manager(Thread):
 
     def initialize(self):
 
-        self.grip_tracker.start()
-        self.timer.start()
-        self.gauge_animation.start()
+        self.message_listener.start()
+        self.grip_listener.start()
+        self.session_writer.start()
 
     def run(self):
 
         log("Run.", self.name)
-        while not self.shutdown.is_set():
-            log("Waiting for a message.", self.name)
-            message = self.queues["manager"].get()
-            self.handle_message(message)
+
+        # Save the sessions interrupted by a crash
+        for session_table in journal.recover(self.get_journal_folder()):
+            log("Session recovered from the journal in table '{}'.".format(session_table), self.name)
+
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
 
         self.die()
 
+        self.loop.close()
+
+    def receive_message(self, message):
+
+        with tracer.span("state_handler:{}".format(message[0])):
+            self.handle_message(message)
+
+        if self.shutdown.is_set():
+            self.loop.stop()
+
     def die(self):
 
         log("End program.", self.name)
 
-        if self.current_saving.is_set():
+        if self.session_writer.pending():
             log("Wait for saving.", self.name)
-            self.data_saved.wait()
+        self.session_writer.end()
 
         self.timer.end()
         self.gauge_animation.end()
 
         self.grip_tracker.end()
-        self.grip_manager.end()
-        self.valve_manager.end()
-        self.ttl_manager.end()
+        self.message_listener.end()
+        self.grip_listener.end()
+        self.transport.end()
 
         self.ask_interface(("close_all_windows",))
 
@@ -149,231 +192,71 @@ class Manager(Thread):
 
     # ------------------------ HANDLE MESSAGE --------------------------- #
 
-    def handle_message(self, message):
-
-        if message[0] == "game":
-
-            command = message[1]
-
-            if command == "choice":
-
-                if self.state == "show_stimuli":
-                    self.did_not_release_grip_to_decide()
-
-                elif self.state == "release_grip_to_decide":
-
-                    self.ask_interface(("play_sound", "choice"))
-
-                    side = message[2]
-
-                    if side == "left":
-                        log("Choice left.", self.name)
-                        self.decide("left")
+    states = [
+        "", "end_game", "new_block", "new_trial", "wait_for_grasping", "grasp_before_stimuli_display", "show_stimuli",
+        "release_grip_to_decide", "decide", "show_results", "inter_trial", "punishment", "reward", "inter_block"
+    ]
 
-                    elif side == "right":
-                        log("Choice right.", self.name)
-                        self.decide("right")
-
-                    else:
-                        log("I will raise an exception.", self.name)
-                        raise Exception
-
-                else:
-                    log("Ignore click on target left because state is not 'show_stimuli'.", self.name)
-
-            elif command == "play":
-                log("Play.", self.name)
-                self.play_game()
-
-            elif command == "close":
-                log("Close game window.", self.name)
-                self.end_game()
-
-            else:
-                log("ERROR: Message received from GameWindow not understood: '{}'.".format(message), self.name)
-                raise Exception("{}: Received message '{}' but did'nt expected anything like that."
-                                .format(self.name, message))
-
-        elif message[0] == "grip_tracker":
-
-            command = message[1]
-            log("Received from GripTracker: '{}'.".format(command), self.name)
-
-            if command == "release_before_end_of_fixation_time":
-
-                if self.state == "grasp_before_stimuli_display":
-                    self.release_before_end_of_fixation_time()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "grasp_before_stimuli_display":
-
-                if self.state == "wait_for_grasping":
-                    self.grasp_before_stimuli_display()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "release_grip_to_decide":
-
-                if self.state == "show_stimuli":
-                    self.release_grip_to_decide()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "come_back_to_grip_instead_of_deciding":
-                if self.state == "release_grip_to_decide":
-                    self.come_back_to_grip_instead_of_deciding()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "show_results":
-
-                if self.state == "decide":
-                    self.show_results()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            else:
-                log("ERROR: Message received from GripTracker not understood: '{}'.".format(message), self.name)
-                raise Exception("{}: Received message '{}' but did'nt expected anything like that."
-                                .format(self.name, message))
+    def get_transitions(self):
 
-        elif message[0] == "timer":
+        """ (source, command, states in which the event is accepted, handler called with the message) """
 
-            command, ts, = message[1:]
-            log("Received from Timer: '{}' with and ts '{}'.".format(command, ts), self.name)
+        return [
+            ("game", "choice", ["show_stimuli"], lambda m: self.did_not_release_grip_to_decide()),
+            ("game", "choice", ["release_grip_to_decide"], lambda m: self.choose(m[2])),
+            ("game", "play", [ANY], lambda m: self.play_game()),
+            ("game", "close", [ANY], lambda m: self.end_game()),
 
-            if command == "begin_new_block":
+            # Grip tracker messages come with the time of the change of the grip state (clock of this computer)
+            ("grip_tracker", "release_before_end_of_fixation_time", ["grasp_before_stimuli_display"],
+             lambda m: self.release_before_end_of_fixation_time()),
+            ("grip_tracker", "grasp_before_stimuli_display", ["wait_for_grasping"],
+             lambda m: self.grasp_before_stimuli_display(m[2])),
+            ("grip_tracker", "release_grip_to_decide", ["show_stimuli"], lambda m: self.release_grip_to_decide(m[2])),
+            ("grip_tracker", "come_back_to_grip_instead_of_deciding", ["release_grip_to_decide"],
+             lambda m: self.come_back_to_grip_instead_of_deciding()),
+            ("grip_tracker", "show_results", ["decide"], lambda m: self.show_results(m[2])),
 
-                if self.state == "end_block":
-                    self.begin_new_block()
+            ("timer", "show_stimuli", ["grasp_before_stimuli_display"], lambda m: self.show_stimuli()),
+            ("timer", "did_not_came_back_to_the_grip", ["decide"], lambda m: self.did_not_came_back_to_the_grip()),
+            ("timer", "did_not_take_decision", ["show_stimuli", "release_grip_to_decide"],
+             lambda m: self.did_not_take_decision()),
+            ("timer", "inter_trial", ["show_results"], lambda m: self.inter_trial()),
+            ("timer", "end_trial", ["inter_trial", "punishment"], lambda m: self.end_trial()),
+            ("timer", "inter_block", ["reward"], lambda m: self.inter_block()),
+            ("timer", "end_block", ["inter_block"], lambda m: self.end_block()),
 
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
+            ("gauge_animation", "set_gauge_quantity", ["show_results", "reward"],
+             lambda m: self.set_gauge_quantity(**m[2])),
 
-            elif command == "show_stimuli":
+            ("interface", "close_task", [ANY], lambda m: self.end_game()),
+            ("interface", "close", [ANY], lambda m: log("Interface close window.", self.name)),
+            ("interface", "run", [ANY], lambda m: self.prepare_game(parameters=m[2])),
+        ]
 
-                if self.state == "grasp_before_stimuli_display":
-                    self.show_stimuli()
+    @property
+    def state(self):
 
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
+        return self.state_machine.state
 
-            elif command == "did_not_came_back_to_the_grip":
+    @state.setter
+    def state(self, state):
 
-                if self.state == "decide":
-                    self.did_not_came_back_to_the_grip()
+        self.state_machine.enter(state)
 
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "did_not_take_decision":
-
-                if self.state in ["show_stimuli", "release_grip_to_decide"]:
-                    self.did_not_take_decision()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "inter_trial":
-
-                if self.state == "show_results":
-                    self.inter_trial()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "end_trial":
-
-                if self.state in ["inter_trial", "punishment"]:
-                    self.end_trial()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "inter_block":
-
-                if self.state == "reward":
-                    self.inter_block()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            elif command == "end_block":
-
-                if self.state == "inter_block":
-                    self.end_block()
-
-                else:
-                    log("Command '{}' ignored (not in the appropriate state)."
-                        .format(command), self.name)
-
-            else:
-                log("ERROR: Message received from Timer not understood: '{}'.".format(message), self.name)
-                raise Exception("{}: Received message '{}' from Timer but did'nt expected anything like that."
-                                .format(self.name, message))
-
-        elif message[0] == "gauge_animation":
-
-            if self.state in ["show_results", "reward"]:
-
-                command, kwargs, = message[1:]
-
-                if command == "set_gauge_quantity":
-                    self.set_gauge_quantity(**kwargs)
-
-                else:
-                    log("ERROR: Message received from GaugeAnimation not understood: '{}'.".format(message), self.name)
-                    raise Exception("{}: Received message '{}' from GaugeAnimation "
-                                    "but did'nt expected anything like that."
-                                    .format(self.name, message))
-
-            else:
-                log("Command '{}' ignored (not in the appropriate state)."
-                    .format("gauge_animation"), self.name)
-
-        elif message[0] == "interface":
+    def handle_message(self, message):
 
-            command = message[1]
-            if command == "close_task":
-                log("Interface close task.", self.name)
-                self.end_game()
+        self.state_machine.dispatch(message)
 
-            elif command == "close":
-                log("Interface close window.", self.name)
-                return
+    def choose(self, side):
 
-            elif command == "run":
+        if side not in ("left", "right"):
+            raise Exception("{}: Choice '{}' not understood.".format(self.name, side))
 
-                log("Interface run.", self.name)
-                parameters = message[2]
-                self.prepare_game(parameters=parameters)
-            else:
-                log("ERROR: Message received from Interface not understood.", self.name)
-                raise Exception("{}: Received message '{}' but did'nt expected anything like that."
-                                .format(self.name, message))
+        self.ask_interface(("play_sound", "choice"))
 
-        else:
-            log("ERROR: Message not understood: '{}'.".format(message), self.name)
-            raise Exception("{}: Received message '{}' but did'nt expected anything like that."
-                            .format(self.name, message))
+        log("Choice {}.".format(side), self.name)
+        self.decide(side)
 
     def ask_interface(self, instruction):
 
@@ -410,24 +293,23 @@ class Manager(Thread):
 
         # Reinitialize
         self.to_save = []
+        if self.parameters["save"]:
+            self.journal = journal.Journal(
+                folder=self.get_journal_folder(),
+                parameters={k: v for k, v in self.parameters.items() if k != "save"},
+                session_date=str(date.today()))
         self.trial_counter = [0, 0]
         self.n_block = 0
 
     def connect_grip_and_valve(self):
 
-        if not self.client.is_connected():
-
-            while not self.shutdown.is_set():
-                connected = self.client.establish_connection()
-                if connected:
-                    break
-                else:
-                    self.waiting_event.wait(0.5)
+        # The transport connects by itself, and connects again whenever the connection is lost
+        if not self.transport.is_alive():
+            self.grip_manager.start()
+            self.transport.start()
 
-            if not self.shutdown.is_set():
-                self.valve_manager.start()
-                self.grip_manager.start()
-                self.ttl_manager.start()
+        while not self.transport.is_connected() and not self.shutdown.is_set():
+            self.waiting_event.wait(0.5)
 
     def play_game(self):
 
@@ -450,6 +332,14 @@ class Manager(Thread):
         self.timer.cancel(debug="Coming from 'end_game'")
         self.gauge_animation.cancel()
 
+        # Timing accuracy of the session
+        self.scheduler.stats.report()
+        self.state_machine.report()
+        tracer.report()
+        if self.parameters and self.parameters["save"]:
+            self.export_trace()
+        tracer.clear()
+
         # Update display on game window
         self.ask_interface(("prepare_next_run", ))
 
@@ -589,21 +479,25 @@ class Manager(Thread):
         else:
             self.grip_tracker.launch(msg="grasp_before_stimuli_display")
 
-    def grasp_before_stimuli_display(self):
+    def grasp_before_stimuli_display(self, grip_time=None):
 
         log("NEW STATE -> Grasp before stimuli display.", self.name)
 
         # Update state
         self.state = "grasp_before_stimuli_display"
 
-        print("*********************** TTL GRASP *******************************")
+        log("TTL: grasp.", self.name, level="debug")
+
+        # Grip already hold at the beginning of the trial: no transition to date it
+        if grip_time is None:
+            grip_time = self.clock()
 
         if self.n_block == 0 and self.n_trial_inside_block == 0:
-            self.time_reference = time.perf_counter()
+            self.time_reference = grip_time
             self.time_stamp_grip_onset = 0
 
         else:
-            self.time_stamp_grip_onset = time.perf_counter() - self.time_reference
+            self.time_stamp_grip_onset = grip_time - self.time_reference
 
         # Inform recording system
         self.ttl_manager.send_signal()
@@ -628,9 +522,9 @@ class Manager(Thread):
         # Stop grip tracker whose purpose was to rise an error if user has release the grip
         self.grip_tracker.cancel()
 
-        print("*********************** TTL STIMULI *******************************")
+        log("TTL: stimuli.", self.name, level="debug")
 
-        self.time_stamp_cue_onset = time.perf_counter() - self.time_reference
+        self.time_stamp_cue_onset = self.clock() - self.time_reference
 
         # Inform recording system
         self.ttl_manager.send_signal()
@@ -645,16 +539,16 @@ class Manager(Thread):
         # # Observe if the user holds the grip for a certain time, otherwise do what is appropriate
         self.grip_tracker.launch(msg="release_grip_to_decide")
 
-    def release_grip_to_decide(self):
+    def release_grip_to_decide(self, grip_time):
 
         # Update state
         self.state = "release_grip_to_decide"
 
         log("NEW STATE -> Release grip to decide.", self.name)
 
-        print("*********************** TTL RELEASE GRIP *******************************")
+        log("TTL: release grip.", self.name, level="debug")
 
-        self.time_stamp_release_grip = time.perf_counter() - self.time_reference
+        self.time_stamp_release_grip = grip_time - self.time_reference
 
         # Inform recording system
         self.ttl_manager.send_signal()
@@ -676,9 +570,9 @@ class Manager(Thread):
         # Cancel grip tracker
         self.grip_tracker.cancel()
 
-        print("*********************** TTL DECIDE *******************************")
+        log("TTL: decide.", self.name, level="debug")
 
-        self.time_stamp_cue_contact = time.perf_counter() - self.time_reference
+        self.time_stamp_cue_contact = self.clock() - self.time_reference
 
         # Inform recording system
         self.ttl_manager.send_signal()
@@ -699,7 +593,7 @@ class Manager(Thread):
         # Measure movement time
         self.time_movement = self.time_stamp_cue_contact - self.time_stamp_release_grip
 
-    def show_results(self):
+    def show_results(self, grip_time):
 
         log("NEW STATE -> Show results.", self.name)
 
@@ -712,9 +606,9 @@ class Manager(Thread):
         # Prepare results
         self.set_results()
 
-        print("*********************** TTL RESULTS *******************************")
+        log("TTL: results.", self.name, level="debug")
 
-        self.time_stamp_result_period_onset = time.perf_counter() - self.time_reference
+        self.time_stamp_result_period_onset = self.clock() - self.time_reference
 
         # Inform recording system
         self.ttl_manager.send_signal()
@@ -730,7 +624,7 @@ class Manager(Thread):
         self.filling_gauge_animation()
 
         # Measure time for coming back to the grip
-        self.time_back_movement = self.time_stamp_result_period_onset - self.time_stamp_cue_contact
+        self.time_back_movement = grip_time - self.time_reference - self.time_stamp_cue_contact
 
     def inter_trial(self):
 
@@ -745,9 +639,9 @@ class Manager(Thread):
         if self.parameters["inter_trial_time"][1] > 0:
 
             # Inform recording system
-            print("*********************** TTL INTERTRIAL *******************************")
+            log("TTL: inter-trial.", self.name, level="debug")
 
-            self.time_stamp_inter_trial_interval_onset = time.perf_counter() - self.time_reference
+            self.time_stamp_inter_trial_interval_onset = self.clock() - self.time_reference
 
             self.ttl_manager.send_signal()
 
@@ -775,9 +669,9 @@ class Manager(Thread):
 
         if self.parameters["inter_block_time"][1] > 0:
 
-            print("*********************** TTL INTERBLOCK*******************************")
+            log("TTL: inter-block.", self.name, level="debug")
 
-            self.time_stamp_inter_block_interval_onset = time.perf_counter() - self.time_reference
+            self.time_stamp_inter_block_interval_onset = self.clock() - self.time_reference
 
             # Inform recording system
             self.ttl_manager.send_signal()
@@ -823,9 +717,9 @@ class Manager(Thread):
 
     def venting_gauge_animation(self):
 
-        print("*********************** TTL VENTING *******************************")
+        log("TTL: venting.", self.name, level="debug")
 
-        self.time_stamp_reward_period_onset = time.perf_counter() - self.time_reference
+        self.time_stamp_reward_period_onset = self.clock() - self.time_reference
 
         # Inform recording system
         self.ttl_manager.send_signal()
@@ -937,39 +831,59 @@ class Manager(Thread):
 
 # ------------------------------------- SAVE -------------------------------------------------------------------- #
 
+    @staticmethod
+    def results_folder(key):
+
+        parameters_folder = path.abspath("{}/../parameters".format(path.dirname(path.abspath(__file__))))
+        with open("{}/results_path.json".format(parameters_folder)) as file:
+            return path.expanduser(json.load(file)[key])
+
+    def get_journal_folder(self):
+
+        # One folder per rig, for the merge service (see data_management/merge.py)
+        return "{}/{}".format(self.results_folder("journal_folder"), socket.gethostname())
+
+    def export_trace(self):
+
+        traces_folder = self.results_folder("traces_folder")
+
+        os.makedirs(traces_folder, exist_ok=True)
+        tracer.export("{}/trace_{}_{}.jsonl".format(
+            traces_folder, datetime.now().strftime("%Y_%m_%d_%H_%M_%S"), self.parameters["monkey"]))
+
     def save_trial(self):
 
-        to_save = \
-            {
-                "error": self.error,
-                "choice": self.choice,
-                "dice_output": self.dice_output,
-                "gauge_level": self.gauge_level,
-                "n_trial_inside_block": self.n_trial_inside_block - 1, # Saving function is called after increasing n
-                "n_block": self.n_block,
-                "time_reaction": int(self.time_reaction * 1000),
-                "time_movement": int(self.time_movement * 1000),
-                "time_back_movement": int(self.time_back_movement * 1000),
-                "time_inter_trial": int(self.time_inter_trial * 1000),
-                "time_inter_block": int(self.time_inter_block * 1000),
-                "time_fixation": int(self.time_fixation * 1000),
-                "time_stamp_grip_onset": int(self.time_stamp_grip_onset * 1000),
-                "time_stamp_release_grip": int(self.time_stamp_release_grip * 1000),
-                "time_stamp_cue_onset": int(self.time_stamp_cue_onset * 1000),
-                "time_stamp_cue_contact": int(self.time_stamp_cue_contact * 1000),
-                "time_stamp_result_period_onset": int(self.time_stamp_result_period_onset * 1000),
-                "time_stamp_reward_period_onset": int(self.time_stamp_reward_period_onset * 1000),
-                "time_stamp_inter_block_interval_onset": int(self.time_stamp_inter_block_interval_onset * 1000),
-                "time_stamp_inter_trial_interval_onset": int(self.time_stamp_inter_trial_interval_onset * 1000),
-            }
-        to_save.update(self.stimuli_parameters)
-        self.to_save.append(to_save)
+        trial = TrialRecord(
+            error=self.error,
+            choice=self.choice,
+            dice_output=self.dice_output,
+            gauge_level=self.gauge_level,
+            n_trial_inside_block=self.n_trial_inside_block - 1, # Saving function is called after increasing n
+            n_block=self.n_block,
+            time_reaction=self.time_reaction,
+            time_movement=self.time_movement,
+            time_back_movement=self.time_back_movement,
+            time_inter_trial=self.time_inter_trial,
+            time_inter_block=self.time_inter_block,
+            time_fixation=self.time_fixation,
+            time_stamp_grip_onset=self.time_stamp_grip_onset,
+            time_stamp_release_grip=self.time_stamp_release_grip,
+            time_stamp_cue_onset=self.time_stamp_cue_onset,
+            time_stamp_cue_contact=self.time_stamp_cue_contact,
+            time_stamp_result_period_onset=self.time_stamp_result_period_onset,
+            time_stamp_reward_period_onset=self.time_stamp_reward_period_onset,
+            time_stamp_inter_block_interval_onset=self.time_stamp_inter_block_interval_onset,
+            time_stamp_inter_trial_interval_onset=self.time_stamp_inter_trial_interval_onset,
+            **self.stimuli_parameters
+        )
+        self.to_save.append(trial)
+
+        if self.journal is not None:
+            self.journal.append(trial)
 
     def save_session(self):
 
-        # In case of trying to end program
-        self.data_saved.clear()
-        self.current_saving.set()
+        """ Hand the session over to the session writer: the Manager is free as soon as this returns """
 
         log("SAVE SESSION.", self.name)
 
@@ -977,72 +891,30 @@ class Manager(Thread):
 
         if len(self.to_save) < 1:
             log("No trials to save.", self.name)
-            self.current_saving.clear()
-            self.data_saved.set()
-            return
+            if self.journal is not None:
+                self.journal.close()
 
         else:
             log("{} trials to save.".format(len(self.to_save)), self.name)
 
-        database = Database()
-        summary_table_name = "summary"
+            future = self.session_writer.submit(
+                parameters=dict(self.parameters), trials=self.to_save, session_date=str(date.today()))
+            future.add_done_callback(partial(self.session_saved, journal=self.journal))
 
-        # Verify if a summary table exists, otherwise, create it
-        if not database.table_exists(summary_table_name):
+        self.journal = None
 
-            columns = OrderedDict()
+    def session_saved(self, future, journal):
 
-            # Add columns for date and name of session table
-            columns["date"] = str
-            columns["session_table"] = str
+        """ Called by the session writer once the session is saved (or failed to be) """
 
-            # Add a column for every parameter in parameter dic
-            for key, value in sorted(self.parameters.items()):
-                columns[key] = type(value)
-            database.create_table(
-                table_name=summary_table_name,
-                columns=columns)
-
-            log("Summary table created.", self.name)
+        if future.exception() is None:
+            log("DATA SAVED in table '{}'.".format(future.result()), self.name)
+            if journal is not None:
+                journal.mark_as_saved(future.result())
 
         else:
-            log("Summary table already exists.", self.name)
-
-        # Create a session table
-        log("Create session table.", self.name)
-        monkey = self.parameters["monkey"]
-        session_table_name = "session_{}_{}".format(str(date.today()).replace("-", "_"), monkey)
-        if database.table_exists(table_name=session_table_name):
-
-            log("Session table with name {} already exists.".format(session_table_name), self.name)
-
-            idx = 2
-            session_table_name += "({})".format(idx)
-            while database.table_exists(table_name=session_table_name):
-                log("Session table with name {} already exists.".format(session_table_name), self.name)
-                session_table_name = session_table_name.replace("({})".format(idx), "({})".format(idx+1))
-                idx += 1
-
-        columns = OrderedDict()
-        for key, value in sorted(self.to_save[0].items()):
-            columns[key] = type(value)
-
-        database.create_table(
-            table_name=session_table_name,
-            columns=columns
-        )
-
-        log("Session table created with name {}.".format(session_table_name), self.name)
-
-        # Fill summary table
-        database.fill_table(summary_table_name, **self.parameters, date=str(date.today()),
-                            session_table=session_table_name)
-
-        # Fill session table
-        for i in range(len(self.to_save)):
-            database.fill_table(session_table_name, **self.to_save[i])
-
-        log("DATA SAVED.", self.name)
+            # The journal is left as not saved: the session will be recovered at next start-up
+            log("DATA NOT SAVED.", self.name, level="error")
 
-        self.current_saving.clear()
-        self.data_saved.set()
+        if journal is not None:
+            journal.close()
@@ -0,0 +1,84 @@
+from threading import Lock
+import struct
+import time
+
+
+"""
+Binary protocol between the task computer and the Raspberry Pi.
+Every frame has the same size: kind (uint8), sequence number (uint32), value (int32), time stamp (int64, ns).
+The program of the Raspberry Pi (raspi/raspi_manager.py) has its own copy of these definitions: keep them identical.
+"""
+
+
+frame = struct.Struct("<BIiq")
+
+# From the task computer (time stamp: clock of the task computer when sending)
+VALVE = 1  # value: opening time (ms)
+TTL = 2
+GRIP_SUBSCRIBE = 3
+SYNC = 4
+
+# From the Raspberry Pi
+GRIP_STATE = 16  # value: grip state; time stamp: clock of the RPi at the transition
+SYNC_REPLY = 17  # same sequence number as the SYNC frame; time stamp: clock of the RPi at reception
+ACK = 18  # same sequence number as the VALVE or TTL frame; time stamp: clock of the RPi at reception
+
+# Frames answering a request of the task computer
+replies = (SYNC_REPLY, ACK)
+
+
+def pack(kind, seq, value=0, time_stamp=0):
+
+    return frame.pack(kind, seq & 0xFFFFFFFF, value, time_stamp)
+
+
+def unpack(data):
+
+    return frame.unpack(data)
+
+
+def local_clock():
+
+    """ Clock of the task computer (same as the one used by the Manager for time stamps) """
+
+    return time.perf_counter_ns()
+
+
+class ClockOffset(object):
+
+    """
+    Offset between the clock of the RPi and the clock of the task computer, estimated from SYNC round trips:
+    for a SYNC sent at t0 (local), received at t1 (remote) and answered at t2 (local),
+    offset = t1 - (t0 + t2) / 2, the sample with the shortest round trip being the most reliable one.
+    """
+
+    name = "ClockOffset"
+
+    n_samples = 20
+
+    def __init__(self):
+
+        self.lock = Lock()
+        self.samples = []
+
+        self.offset = None
+        self.round_trip = None
+
+    def add_sample(self, t0, t1, t2):
+
+        with self.lock:
+
+            self.samples.append((t2 - t0, t1 - (t0 + t2) // 2))
+            self.samples = self.samples[-self.n_samples:]
+
+            self.round_trip, self.offset = min(self.samples)
+
+    def is_known(self):
+
+        return self.offset is not None
+
+    def to_local(self, remote_time):
+
+        """ Convert a time stamp of the RPi (ns) in seconds on the clock of the task computer """
+
+        return (remote_time - self.offset) / 10**9
@@ -1,25 +1,76 @@
-from multiprocessing import Queue
-from threading import Thread, Event
+from threading import Thread, Event, Lock
+from collections import deque
 from datetime import datetime as dt
+from time import perf_counter
+import itertools as it
+import selectors
 import socket
-import errno
 
+from task import protocol
+from task.protocol import ClockOffset
+from utils.tracing import tracer
 from utils.utils import log
 
 
 # --------------------------------------------------------------------------------------------------------------- #
-# ------------------------------------- ABSTRACT CLASS TO COMMUNICATE WITH THE  RASPBERRY PI -------------------- #
+# ------------------------------------- CONNECTION WITH THE RASPBERRY PI ---------------------------------------- #
 # --------------------------------------------------------------------------------------------------------------- #
 
 
-class Client(object):
+class Transport(Thread):
 
-    def __init__(self, ip_address, port):
+    """
+    Connection with the Raspberry Pi, owned by one I/O thread.
+    Other threads only put frames in the outgoing queues: the I/O thread writes them (commands first),
+    reads the incoming frames and dispatches them, either to the callback of the request they answer
+    (same sequence number) or to the handler of their kind.
+    This thread is the only one to touch (and close) the socket. It lives as long as the program, and connects
+    again whenever the connection is lost; handlers stay subscribed, and 'on_connect' callbacks are called
+    on every new connection.
+    """
+
+    name = "Transport"
+
+    def __init__(self, ip_address, port, idle_period=1., retry_period=0.5):
+
+        super().__init__()
 
         self.server_address = (ip_address, port)
         self.socket = None
         self.connected = False
 
+        # Period after which idle callbacks are called if nothing happens on the connection (s)
+        self.idle_period = idle_period
+
+        # Period between two attempts of connection (s)
+        self.retry_period = retry_period
+
+        self.seq = it.count(1)
+
+        # Commands (valve, TTL) always go before background traffic (clock synchronizations)
+        self.commands = deque()
+        self.background = deque()
+        self.out_buffer = b""
+
+        self.in_buffer = b""
+
+        self.handlers = {}
+        self.idle_callbacks = []
+        self.connect_callbacks = []
+
+        # Sequence number -> (callback, time of sending)
+        self.pending = {}
+        self.pending_lock = Lock()
+
+        self.selector = selectors.DefaultSelector()
+
+        # Allow other threads to wake up the I/O thread
+        self.wake_up_reader, self.wake_up_writer = socket.socketpair()
+        self.wake_up_reader.setblocking(False)
+        self.wake_up_writer.setblocking(False)
+
+        self.shutdown = Event()
+
     def establish_connection(self):
 
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -28,119 +79,311 @@ class Client(object):
         try:
 
             sock.connect(self.server_address)
-            sock.settimeout(None)
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             log("I'm connected.", "RaspiManager")
             self.socket = sock
+            # Frames queued while disconnected are not sent late (see 'drop_queued')
+            self.drop_queued()
             self.connected = True
             return 1
 
         except socket.error as e:
-            log("Error during socket connexion: {}.".format(e), "RaspiManager")
-            if e.errno == errno.ECONNREFUSED:
-                sock.close()
+            log("Error during socket connexion: {}.".format(e), "RaspiManager", level="warning")
+            # Attempts are repeated as long as the RPi is unreachable
+            sock.close()
             return 0
 
-    def send(self, string):
+    def is_connected(self):
 
-        self.socket.send('{:*<5}'.format(string).encode())
+        return self.connected
 
-    def recv(self):
+    # ----------------------------- Interface for other threads ----------------------------------- #
 
-        return self.socket.recv(1).decode()
+    def subscribe(self, kind, handler):
 
-    def close(self):
+        """ 'handler' is called from the I/O thread with (kind, seq, value, time_stamp) for every frame of this kind """
 
-        self.socket.close()
+        self.handlers[kind] = handler
 
-    def is_connected(self):
+    def on_idle(self, callback):
 
-        return self.connected
+        self.idle_callbacks.append(callback)
 
+    def on_connect(self, callback):
 
-# --------------------------------------------------------------------------------------------------------------- #
-# ------------------------------------- VALVE MANAGER ----------------------------------------------------------- #
-# --------------------------------------------------------------------------------------------------------------- #
+        """ 'callback' is called from the I/O thread every time the connection is (re)established """
 
+        self.connect_callbacks.append(callback)
 
-class ValveManager(Thread):
+    def send(self, kind, value=0, callback=None, command=True):
 
-    name = "ValveManager"
+        """
+        Queue a frame, return its sequence number.
+        'callback' is called from the I/O thread with the reply (kind, seq, value, time_stamp),
+        the local time of sending and the local time of reception (ns).
+        """
 
-    def __init__(self, client):
+        seq = next(self.seq) & 0xFFFFFFFF
 
-        super().__init__()
+        (self.commands if command else self.background).append((kind, seq, value, callback))
+        self.wake_up()
 
-        self.valve_queue = Queue()
-        self.shutdown = Event()
+        return seq
+
+    def wake_up(self):
+
+        try:
+            self.wake_up_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            # Buffer full: the I/O thread will wake up anyway
+            pass
 
-        self.client = client
+    def end(self):
+
+        self.shutdown.set()
+        self.wake_up()
+
+    # ----------------------------- I/O thread ---------------------------------------------------- #
 
     def run(self):
 
         log("Running.", self.name)
 
-        while not self.shutdown.is_set():
+        self.selector.register(self.wake_up_reader, selectors.EVENT_READ)
 
-            v = self.valve_queue.get()
-            if not self.shutdown.is_set():
+        try:
 
-                self.client.send("v{:4d}".format(v))
+            while not self.shutdown.is_set():
 
-        self.client.close()
+                if self.socket is None and not self.establish_connection():
+                    self.shutdown.wait(self.retry_period)
+                    continue
 
-        log("DEAD.", self.name)
+                self.serve()
+                self.disconnect()
 
-    def open(self, time):
+        finally:
+            self.close()
+            log("DEAD.", self.name)
 
-        self.valve_queue.put(time)
+    def serve(self):
 
-    def end(self):
+        """ Handle the current connection, until it is lost or the transport is ended """
 
-        self.shutdown.set()
-        self.valve_queue.put(None)
+        for callback in self.connect_callbacks:
+            callback()
+
+        self.selector.register(self.socket, selectors.EVENT_READ)
+
+        writing = False
+
+        try:
+
+            while not self.shutdown.is_set():
+
+                if self.has_output() != writing:
+                    writing = not writing
+                    self.selector.modify(
+                        self.socket, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0))
+
+                events = self.selector.select(timeout=self.idle_period)
+
+                if not events:
+                    for callback in self.idle_callbacks:
+                        callback()
+                    continue
+
+                for key, mask in events:
+
+                    if key.fileobj is self.wake_up_reader:
+                        self.drain_wake_up()
+                        continue
+
+                    if mask & selectors.EVENT_READ:
+                        if not self.read():
+                            log("Connection closed by the RPi.", self.name, level="warning")
+                            return
+
+                    if mask & selectors.EVENT_WRITE:
+                        self.write()
+
+        except OSError as e:
+            log("Connection lost: {}.".format(e), self.name, level="error")
+
+    def disconnect(self):
+
+        """ Forget the lost connection: requests sent on it will never be answered """
+
+        self.connected = False
+
+        self.selector.unregister(self.socket)
+        self.socket.close()
+        self.socket = None
+
+        self.in_buffer = b""
+        self.out_buffer = b""
+
+        self.drop_queued()
+
+        with self.pending_lock:
+            self.pending.clear()
+
+    def drop_queued(self):
+
+        """
+        Commands are time-critical: a valve opened (or a TTL sent) once the connection is back would be unrelated
+        to any trial; synchronizations of the clocks are meaningless once late
+        """
+
+        if self.commands:
+            log("{} commands dropped, the connection having been lost.".format(len(self.commands)), self.name,
+                level="warning")
+
+        self.commands.clear()
+        self.background.clear()
+
+    def drain_wake_up(self):
+
+        try:
+            while self.wake_up_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def has_output(self):
+
+        return bool(self.out_buffer or self.commands or self.background)
+
+    def write(self):
+
+        now = protocol.local_clock()
+
+        while len(self.out_buffer) < 4096 and (self.commands or self.background):
+
+            kind, seq, value, callback = (self.commands or self.background).popleft()
+
+            if callback is not None:
+                with self.pending_lock:
+                    self.pending[seq] = (callback, now)
+
+            # Time stamp is the time of sending
+            self.out_buffer += protocol.pack(kind, seq, value, now)
+
+        try:
+            n = self.socket.send(self.out_buffer)
+            self.out_buffer = self.out_buffer[n:]
+        except BlockingIOError:
+            pass
+
+    def read(self):
+
+        try:
+            data = self.socket.recv(4096)
+        except BlockingIOError:
+            return True
+
+        if not data:
+            return False
+
+        t = protocol.local_clock()
+
+        self.in_buffer += data
+
+        size = protocol.frame.size
+        n_frames = len(self.in_buffer) // size
+
+        for i in range(n_frames):
+            self.dispatch(protocol.unpack(self.in_buffer[i*size:(i+1)*size]), t)
+
+        self.in_buffer = self.in_buffer[n_frames*size:]
+
+        return True
+
+    def dispatch(self, frame, t):
+
+        kind, seq = frame[0], frame[1]
+
+        if kind in protocol.replies:
+
+            with self.pending_lock:
+                request = self.pending.pop(seq, None)
+
+            if request is not None:
+                callback, t_sent = request
+                callback(frame, t_sent, t)
+            return
+
+        handler = self.handlers.get(kind)
+        if handler is not None:
+            handler(frame)
+
+        else:
+            log("Frame not understood: {}.".format(frame), self.name, level="warning")
+
+    def close(self):
+
+        self.connected = False
+
+        self.selector.close()
+        self.wake_up_reader.close()
+        self.wake_up_writer.close()
+
+        if self.socket is not None:
+            self.socket.close()
 
 
 # --------------------------------------------------------------------------------------------------------------- #
-# ------------------------------------- TTL MANAGER ------------------------------------------------------------ #
+# ------------------------------------- VALVE MANAGER ----------------------------------------------------------- #
 # --------------------------------------------------------------------------------------------------------------- #
 
 
-class TtlManager(Thread):
+class ValveManager(object):
 
-    name = "TtlManager"
+    name = "ValveManager"
 
-    def __init__(self, client):
+    def __init__(self, transport):
 
-        super().__init__()
+        self.transport = transport
 
-        self.client = client
+    def open(self, time):
 
-        self.ttl_queue = Queue()
-        self.shutdown = Event()
+        # A reward given once the connection is back would be unrelated to the trial
+        if not self.transport.is_connected():
+            log("Not connected to the RPi: valve not opened.", self.name, level="error")
+            return
 
-    def run(self):
+        self.transport.send(protocol.VALVE, value=time, callback=self.acknowledged)
 
-        log("Running.", self.name)
+    def acknowledged(self, frame, t_sent, t_received):
 
-        while not self.shutdown.is_set():
+        tracer.record("valve_open", t_sent, t_received)
+        log("Opening of the valve acknowledged in {:.2f} ms.".format((t_received - t_sent) / 10**6), self.name, level="debug")
 
-            self.ttl_queue.get()
-            if not self.shutdown.is_set():
 
-                self.client.send("s")
+# --------------------------------------------------------------------------------------------------------------- #
+# ------------------------------------- TTL MANAGER ------------------------------------------------------------ #
+# --------------------------------------------------------------------------------------------------------------- #
 
-        self.client.close()
 
-        log("DEAD.", self.name)
+class TtlManager(object):
 
-    def end(self):
+    name = "TtlManager"
 
-        self.shutdown.set()
-        self.ttl_queue.put(None)
+    def __init__(self, transport):
+
+        self.transport = transport
 
     def send_signal(self):
 
-        self.ttl_queue.put(True)
+        # Nothing to send if the RPi is not used (fake mode)
+        if self.transport.is_connected():
+            self.transport.send(protocol.TTL, callback=self.acknowledged)
+
+    def acknowledged(self, frame, t_sent, t_received):
+
+        tracer.record("ttl", t_sent, t_received)
+        log("TTL acknowledged in {:.2f} ms.".format((t_received - t_sent) / 10**6), self.name, level="debug")
 
 
 # --------------------------------------------------------------------------------------------------------------- #
@@ -148,319 +391,313 @@ class TtlManager(Thread):
 # --------------------------------------------------------------------------------------------------------------- #
 
 
-class GripManager(Thread):
+class GripManager(object):
 
     name = "GripManager"
 
-    def __init__(self, grip_value, grip_queue, client):
+    n_initial_syncs = 10
 
-        super().__init__()
+    def __init__(self, grip_value, grip_queue, transport):
 
         self.grip_value = grip_value
         self.grip_queue = grip_queue
 
-        self.client = client
+        self.transport = transport
 
-        self.track_signal = Event()
-        self.shutdown = Event()
+        self.clock_offset = ClockOffset()
 
-    def run(self):
+    def start(self):
 
-        log("Running.", self.name)
+        """ Called before the start of the transport, for no frame to be missed """
 
-        while not self.shutdown.is_set():
+        self.transport.subscribe(protocol.GRIP_STATE, self.grip_state)
+        self.transport.on_connect(self.connected)
+        self.transport.on_idle(self.sync)
 
-            self.client.send("g")  # Go signal
-            response = self.client.recv()
-            if response:
+    def connected(self):
 
-                response = int(response)
+        # Estimate the offset between clocks before asking for grip transitions, then whenever the connection is idle
+        for i in range(self.n_initial_syncs):
+            self.sync()
 
-                if response != self.grip_value.value:
-                    self.grip_queue.put(response)
+        # Ask the RPi to send every change of the grip state (subscription is lost with the connection)
+        self.transport.send(protocol.GRIP_SUBSCRIBE)
 
-                self.grip_value.value = response
+    def sync(self):
 
-            Event().wait(0.01)  # Precision of 10 ms for the grip
+        self.transport.send(protocol.SYNC, callback=self.sync_reply, command=False)
 
-        self.client.close()
+    def sync_reply(self, frame, t_sent, t_received):
 
-        log("DEAD.", self.name)
+        self.clock_offset.add_sample(t0=t_sent, t1=frame[3], t2=t_received)
 
-    def end(self):
+    def grip_state(self, frame):
 
-        self.shutdown.set()
+        value, time_stamp = frame[2], frame[3]
+
+        if self.clock_offset.is_known():
+            t = self.clock_offset.to_local(time_stamp)
+
+            # From the transition on the RPi to its reception
+            tracer.record("grip_read", int(t * 10**9))
+        else:
+            t = protocol.local_clock() / 10**9
+
+        if value != self.grip_value.value:
+            self.grip_queue.put((value, t))
+
+        self.grip_value.value = value
 
 
 # --------------------------------------------------------------------------------------------------------------- #
-# ------------------------------------- GRIP TRACKER ------------------------------------------------------------ #
+# ------------------------------------- QUEUE LISTENER ---------------------------------------------------------- #
 # --------------------------------------------------------------------------------------------------------------- #
 
 
-class GripTracker(Thread):
+class QueueListener(Thread):
 
-    name = "GripTracker"
+    """
+    Forward the items put in a queue by other threads to a callback executed by the event loop.
+    Time from the put to the execution of the callback is traced as 'stage'.
+    """
 
-    def __init__(self, change_queue, message_queue):
+    name = "QueueListener"
+
+    def __init__(self, queue, loop, callback, stage):
+
+        super().__init__(daemon=True)
+
+        self.queue = queue
+        self.loop = loop
+        self.callback = callback
+        self.stage = stage
 
-        super().__init__()
-        self.go_queue = Queue()
-        self.change_queue = change_queue
-        self.message_queue = message_queue
-        self.cancel_signal = Event()
         self.shutdown = Event()
-        self.waiting = Event()
-        self.cancelled = Event()
-        self.running = Event()
 
     def run(self):
 
         while not self.shutdown.is_set():
 
-            log("Waiting order.", self.name)
-            msg = self.go_queue.get()
-            self.running.set()
+            item, t = self.queue.get_stamped()
 
             if not self.shutdown.is_set():
 
-                log("If change in grip state, I will deliver message '{}'.".format(msg), self.name)
+                try:
+                    self.loop.call_soon_threadsafe(self.forward, item, t)
 
-                self.waiting.set()
-                args = self.change_queue.get()
-                self.waiting.clear()
+                except RuntimeError:
+                    # Event loop closed
+                    break
 
-                if not self.cancel_signal.is_set():
+        log("I'm DEAD.", self.name)
 
-                    log("Received event in change queue: '{}'.".format(args), self.name)
-                    self.message_queue.put(("grip_tracker", msg))
+    def forward(self, item, t):
 
-                else:
-                    log("Cancelled.", self.name)
-                    self.cancelled.set()
+        tracer.record(self.stage, t)
+        self.callback(item)
 
-        log("I'm DEAD.", self.name)
+    def end(self):
 
-    def launch(self, msg):
+        self.shutdown.set()
+        self.queue.put(None)
 
-        while not self.change_queue.empty():
-            self.change_queue.get()
 
-        self.cancel_signal.clear()
-        self.go_queue.put(msg)
-        self.running.wait()
-        self.running.clear()
+# --------------------------------------------------------------------------------------------------------------- #
+# ------------------------------------- GRIP TRACKER ------------------------------------------------------------ #
+# --------------------------------------------------------------------------------------------------------------- #
 
-    def cancel(self):
 
-        log("CANCEL.", self.name)
+class GripTracker(object):
 
-        self.cancel_signal.set()
+    """
+    Deliver a message at the next change of the grip state.
+    Every method has to be called from the event loop.
+    """
 
-        if self.waiting.is_set():
-            self.change_queue.put(None)
-            self.cancelled.wait()
-            self.cancelled.clear()
-        else:
-            log("I was not running.", self.name)
+    name = "GripTracker"
 
-    def end(self):
+    def __init__(self, deliver, clock=perf_counter):
 
-        log("END.", self.name)
-        self.shutdown.set()
-        self.cancel_signal.set()
-        self.change_queue.put(None)
-        self.go_queue.put(None)
+        self.deliver = deliver
+        self.clock = clock
+        self.msg = None
+        self.launch_time = None
 
-    def is_cancelled(self):
+    def launch(self, msg):
 
-        return self.cancel_signal.is_set()
+        log("If change in grip state, I will deliver message '{}'.".format(msg), self.name, level="debug")
 
+        self.msg = msg
 
-# --------------------------------------------------------------------------------------------------------------- #
-# -------------------------------------------- TIMER ------------------------------------------------------------ #
-# --------------------------------------------------------------------------------------------------------------- #
+        # Changes that happened before the launch are not considered, even if they are not handled yet
+        self.launch_time = self.clock()
 
+    def change(self, args):
 
-class Timer(Thread):
+        """ Called by the event loop for every change of the grip state: (state, time of the change) """
 
-    name = "Timer"
+        if self.msg is None:
+            return
 
-    def __init__(self, message_queue):
+        grip_state, t = args
 
-        super().__init__()
+        if t < self.launch_time:
+            log("Ignore change that happened before the launch: '{}'.".format(args), self.name, level="debug")
+            return
 
-        self.message_queue = message_queue
+        log("Received change of grip state: '{}'.".format(args), self.name, level="debug")
 
-        self.go_queue = Queue()
+        msg, self.msg = self.msg, None
+        self.deliver(("grip_tracker", msg, t))
 
-        self.cancel_signal = Event()
-        self.wait_signal = Event()
-        self.cancelled = Event()
-        self.shutdown = Event()
-        self.waiting = Event()
-        self.running = Event()
+    def cancel(self):
 
-        self.msg, self.ts = None, None
+        log("CANCEL.", self.name, level="debug")
 
-    def run(self):
+        if self.msg is None:
+            log("I was not running.", self.name, level="debug")
 
-        while not self.shutdown.is_set():
+        self.msg = None
 
-            log("Waiting order.", self.name)
+    def end(self):
 
-            msg, time = self.go_queue.get()
-            self.running.set()
+        log("END.", self.name, level="debug")
+        self.msg = None
 
-            if not self.shutdown.is_set():
+    def is_cancelled(self):
 
-                log("ORDER message '{}' with ts '{}'.".format(msg, self.ts), self.name)
+        return self.msg is None
 
-                self.waiting.set()
-                self.wait_signal.wait(timeout=time)
-                self.waiting.clear()
 
-                log("RELEASED WITH MESSAGE '{}' with ts '{}'.".format(msg, self.ts), self.name)
+# --------------------------------------------------------------------------------------------------------------- #
+# -------------------------------------------- TIMER ------------------------------------------------------------ #
+# --------------------------------------------------------------------------------------------------------------- #
 
-                if not self.cancel_signal.is_set():
-                    log("RUN message '{}' with ts '{}'.".format(msg, self.ts), self.name)
-                    self.message_queue.put(("timer", msg, self.ts))
 
-                else:
-                    log("CANCELLED message '{}' with ts '{}'.".format(msg, self.ts), self.name)
-                    self.cancelled.set()
+class Timer(object):
 
-        log("I'm DEAD.", self.name)
+    """
+    Deliver a message after a given time.
+    Every method has to be called from the event loop: cancelling is immediate and the message of a
+    cancelled timer can not be delivered anymore.
+    """
 
-    def launch(self, msg, time, debug=None):
+    name = "Timer"
 
-        ts = dt.utcnow()
-        self.msg, self.ts = msg, ts
+    def __init__(self, scheduler, deliver):
 
-        log("LAUNCH with message '{}' and ts '{}' /// DEBUG: {}.".format(self.msg, self.ts, debug), self.name)
+        self.scheduler = scheduler
+        self.deliver = deliver
 
-        self.cancel_signal.clear()
-        self.wait_signal.clear()
-        self.go_queue.put((msg, time))
-        self.running.wait()
-        self.running.clear()
+        self.handle = None
 
-    def cancel(self, debug=None):
+        self.msg, self.ts = None, None
 
-        log("CANCEL with message '{}' and ts '{}' /// DEBUG: {}.".format(self.msg, self.ts, debug), self.name)
-        self.cancel_signal.set()
+    def launch(self, msg, time, debug=None):
 
-        if self.waiting.is_set():
+        if self.handle is not None:
+            log("Message '{}' with ts '{}' replaced before being delivered.".format(self.msg, self.ts), self.name, level="debug")
+            self.handle.cancel()
 
-            self.wait_signal.set()
-            self.cancelled.wait()
-            self.cancelled.clear()
+        self.msg, self.ts = msg, dt.utcnow()
 
-    def end(self):
+        log("LAUNCH with message '{}' and ts '{}' /// DEBUG: {}.".format(self.msg, self.ts, debug), self.name, level="debug")
 
-        log("END.", self.name)
-        self.shutdown.set()
-        self.cancel_signal.set()
-        self.wait_signal.set()
-        self.go_queue.put((None, None))
+        self.handle = self.scheduler.call_later(time, msg, self.run, msg, self.ts)
 
-    def is_cancelled(self):
+    def run(self, msg, ts, lateness):
 
-        return self.cancel_signal.is_set()
+        log("RUN message '{}' with ts '{}' (late by {:.3f} ms).".format(msg, ts, lateness / 10**6), self.name, level="debug")
 
+        self.handle = None
+        self.deliver(("timer", msg, ts))
 
-class GaugeAnimation(Thread):
+    def cancel(self, debug=None):
 
-    name = "GaugeAnimation"
-    message = "set_gauge_quantity"
+        log("CANCEL with message '{}' and ts '{}' /// DEBUG: {}.".format(self.msg, self.ts, debug), self.name, level="debug")
 
-    def __init__(self, message_queue):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
 
-        super().__init__()
+    def end(self):
 
-        self.message_queue = message_queue
+        log("END.", self.name, level="debug")
+        self.cancel()
 
-        self.go_queue = Queue()
+    def is_cancelled(self):
 
-        self.cancel_signal = Event()
-        self.wait_signal = Event()
-        self.cancelled = Event()
-        self.shutdown = Event()
-        self.waiting = Event()
-        self.running = Event()
+        return self.handle is None
 
-        self.msg, self.ts = None, None
 
-    def run(self):
+class GaugeAnimation(object):
 
-        while not self.shutdown.is_set():
+    """
+    Deliver the successive quantities of the gauge. Every method has to be called from the event loop.
+    Step i is scheduled at start + i * time per unity, so that errors do not accumulate along the sequence.
+    """
 
-            log("Waiting order.", self.name)
+    name = "GaugeAnimation"
+    message = "set_gauge_quantity"
 
-            kwargs = self.go_queue.get()
-            self.running.set()
+    def __init__(self, scheduler, deliver):
 
-            if not self.shutdown.is_set():
+        self.scheduler = scheduler
+        self.deliver = deliver
 
-                # '+2' allows to have a short time before the beginning of the sequence and a short time at the end
-                time_per_unity = kwargs["total_time"] / (kwargs["maximum"] + 2)
-                log("Time per unity: {}, Total time: {}, Maximum x: {}".format(time_per_unity, kwargs["total_time"],
-                                                                kwargs["maximum"]), self.name)
+        self.handle = None
 
-                for i, j in enumerate(kwargs["sequence"]):
+    def launch(self, **kwargs):
 
-                    self.waiting.set()
-                    self.wait_signal.wait(timeout=time_per_unity)
-                    self.waiting.clear()
+        log("LAUNCH", self.name, level="debug")
 
-                    log("RELEASED.", self.name)
+        self.cancel()
 
-                    if not self.cancel_signal.is_set():
-                        log("RUN for the {}st/nd time.".format(i), self.name)
+        # '+2' allows to have a short time before the beginning of the sequence and a short time at the end
+        time_per_unity = kwargs["total_time"] / (kwargs["maximum"] + 2)
+        log("Time per unity: {}, Total time: {}, Maximum x: {}".format(time_per_unity, kwargs["total_time"],
+                                                                        kwargs["maximum"]), self.name, level="debug")
 
-                        kwargs = {
-                            "quantity": j,
-                            "sound": kwargs["sound"],
-                            "water": kwargs["water"]
-                        }
+        self.schedule(steps=list(kwargs["sequence"]), i=0, start=self.scheduler.now(),
+                      step_time=int(time_per_unity * 10**9), sound=kwargs["sound"], water=kwargs["water"])
 
-                        self.message_queue.put(("gauge_animation", self.message, kwargs))
-                    else:
-                        break
+    def schedule(self, steps, i, start, step_time, sound, water):
 
-                log("CANCELLED / FINISHED.", self.name)
-                self.cancelled.set()
+        if i < len(steps):
+            self.handle = self.scheduler.call_at(
+                start + (i + 1) * step_time, self.message, self.run, steps, i, start, step_time, sound, water)
 
-        log("I'm DEAD.", self.name)
+        else:
+            log("FINISHED.", self.name, level="debug")
+            self.handle = None
 
-    def launch(self, **kwargs):
+    def run(self, steps, i, start, step_time, sound, water, lateness):
 
-        log("LAUNCH", self.name)
+        log("RUN for the {}st/nd time (late by {:.3f} ms).".format(i, lateness / 10**6), self.name, level="debug")
 
-        self.cancel_signal.clear()
-        self.wait_signal.clear()
-        self.go_queue.put(kwargs)
-        self.running.wait()
-        self.running.clear()
+        kwargs = {
+            "quantity": steps[i],
+            "sound": sound,
+            "water": water
+        }
 
-    def cancel(self, debug=None):
+        self.deliver(("gauge_animation", self.message, kwargs))
 
-        log("CANCEL with message '{}' and ts '{}' /// DEBUG: {}.".format(self.msg, self.ts, debug), self.name)
-        self.cancel_signal.set()
+        self.schedule(steps, i + 1, start, step_time, sound, water)
 
-        if self.waiting.is_set():
+    def cancel(self, debug=None):
+
+        log("CANCEL /// DEBUG: {}.".format(debug), self.name, level="debug")
 
-            self.wait_signal.set()
-            self.cancelled.wait()
-            self.cancelled.clear()
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
 
     def end(self):
 
-        log("END.", self.name)
-        self.shutdown.set()
-        self.cancel_signal.set()
-        self.wait_signal.set()
-        self.go_queue.put(None)
+        log("END.", self.name, level="debug")
+        self.cancel()
 
     def is_cancelled(self):
 
-        return self.cancel_signal.is_set()
\ No newline at end of file
+        return self.handle is None
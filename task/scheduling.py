@@ -0,0 +1,119 @@
+from collections import deque
+from time import monotonic_ns
+
+from utils.utils import log
+
+
+"""
+Precise scheduling of the events of the task on the event loop of the Manager.
+Events have absolute deadlines on the monotonic clock (ns): the event loop is asked to wake up a little
+before the deadline (its own timers are only accurate to about a millisecond), then the remaining time is spent
+spinning, so that events are delivered well under a millisecond after their deadline and successive
+deadlines do not accumulate errors.
+"""
+
+
+class ScheduledCall(object):
+
+    def __init__(self, deadline, name, callback, args):
+
+        self.deadline = deadline
+        self.name = name
+        self.callback = callback
+        self.args = args
+
+        self.cancelled = False
+        self.handle = None
+
+    def cancel(self):
+
+        self.cancelled = True
+
+        if self.handle is not None:
+            self.handle.cancel()
+
+
+class LatenessStats(object):
+
+    """ Lateness of the events (achieved time minus requested time), per name of event """
+
+    name = "LatenessStats"
+
+    n_samples = 10000
+
+    def __init__(self):
+
+        self.samples = {}
+
+    def add(self, name, lateness):
+
+        self.samples.setdefault(name, deque(maxlen=self.n_samples)).append(lateness)
+
+    def summary(self):
+
+        """ :return: dictionary name -> (number of events, mean, p50, p99, max), in ms """
+
+        summary = {}
+        for name, samples in self.samples.items():
+            x = sorted(i / 10**6 for i in samples)
+            n = len(x)
+            summary[name] = (n, sum(x) / n, x[int(0.5 * (n - 1))], x[int(0.99 * (n - 1))], x[-1])
+
+        return summary
+
+    def report(self):
+
+        for name, (n, mean, p50, p99, maximum) in sorted(self.summary().items()):
+            log("'{}': n={}, mean={:.3f} ms, p50={:.3f} ms, p99={:.3f} ms, max={:.3f} ms."
+                .format(name, n, mean, p50, p99, maximum), self.name)
+
+
+class PrecisionScheduler(object):
+
+    name = "PrecisionScheduler"
+
+    def __init__(self, loop, clock=monotonic_ns, spin_time=10**6):
+
+        """
+        :param clock: clock of the event loop, in ns
+        :param spin_time: time spent spinning before a deadline (ns)
+        """
+
+        self.loop = loop
+        self.clock = clock
+        self.spin_time = spin_time
+
+        self.stats = LatenessStats()
+
+    def now(self):
+
+        return self.clock()
+
+    def call_at(self, deadline, name, callback, *args):
+
+        """ Call 'callback(*args, lateness)' at 'deadline' (monotonic clock, ns). Must be called from the loop """
+
+        call = ScheduledCall(deadline=deadline, name=name, callback=callback, args=args)
+
+        # Clock of the event loop is in seconds
+        call.handle = self.loop.call_at((deadline - self.spin_time) / 10**9, self.spin, call)
+
+        return call
+
+    def call_later(self, delay, name, callback, *args):
+
+        """ 'delay' in seconds """
+
+        return self.call_at(self.now() + int(delay * 10**9), name, callback, *args)
+
+    def spin(self, call):
+
+        while self.spin_time and self.now() < call.deadline:
+            pass
+
+        lateness = self.now() - call.deadline
+        self.stats.add(call.name, lateness)
+
+        call.handle = None
+        if not call.cancelled:
+            call.callback(*call.args, lateness)
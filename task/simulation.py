@@ -0,0 +1,420 @@
+from threading import Thread, Event, Lock
+from time import monotonic_ns, perf_counter
+import asyncio
+import math
+import selectors
+import socket
+import numpy as np
+
+from task import protocol
+from task.experimentalist import Manager
+from utils.channels import get_channels
+from utils.utils import log
+
+
+"""
+Simulated sessions: the Manager state machine driven by a monkey agent, either with a virtual clock
+(time jumps from one event to the next, without any hardware, thousands of trials in a few seconds),
+or in real time against a simulated Raspberry Pi listening on a local TCP port (same protocol as
+raspi/raspi_manager.py), for testing the connection and the timings
+"""
+
+
+# --------------------------------------------------------------------------------------------------------------- #
+# ------------------------------------- VIRTUAL CLOCK ----------------------------------------------------------- #
+# --------------------------------------------------------------------------------------------------------------- #
+
+
+class VirtualClock(object):
+
+    def __init__(self):
+
+        self.ns = 0
+
+    def time(self):
+
+        return self.ns / 10**9
+
+    def time_ns(self):
+
+        return self.ns
+
+    def advance(self, seconds):
+
+        self.ns += max(0, math.ceil(seconds * 10**9))
+
+    def new_event_loop(self):
+
+        return VirtualEventLoop(clock=self)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+
+    """ Never waits for a timer: the clock is moved forward to its deadline instead """
+
+    def __init__(self, clock):
+
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+
+        # Nothing scheduled: wait for an other thread to wake up the loop
+        if timeout is None:
+            return super().select(None)
+
+        events = super().select(0)
+        if not events:
+            self.clock.advance(timeout)
+
+        return events
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+
+    def __init__(self, clock):
+
+        super().__init__(selector=VirtualSelector(clock))
+        self.clock = clock
+
+    def time(self):
+
+        return self.clock.time()
+
+
+# --------------------------------------------------------------------------------------------------------------- #
+# ------------------------------------- SIMULATED RASPBERRY PI -------------------------------------------------- #
+# --------------------------------------------------------------------------------------------------------------- #
+
+
+class SimulatedRaspberryPi(Thread):
+
+    """ Stand-in for raspi/raspi_manager.py on a local port """
+
+    name = "SimulatedRaspberryPi"
+
+    def __init__(self, host="127.0.0.1", port=0):
+
+        super().__init__(daemon=True)
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind((host, port))
+        self.server.listen(1)
+
+        self.address = self.server.getsockname()
+
+        self.conn = None
+        self.lock = Lock()
+        self.seq = 0
+
+        self.subscribed = Event()
+        self.grip_state = 0
+
+        self.n_valve = 0
+        self.n_ttl = 0
+
+    def run(self):
+
+        conn, addr = self.server.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.conn = conn
+
+        log("Connected by '{}'.".format(addr), self.name)
+
+        data = b""
+        while True:
+
+            try:
+                chunk = conn.recv(4096)
+            except OSError:
+                break
+
+            if not chunk:
+                break
+
+            t = monotonic_ns()
+            data += chunk
+
+            while len(data) >= protocol.frame.size:
+                kind, seq, value, time_stamp = protocol.unpack(data[:protocol.frame.size])
+                data = data[protocol.frame.size:]
+                self.handle_frame(kind, seq, value, t)
+
+        conn.close()
+        self.server.close()
+
+        log("DEAD.", self.name)
+
+    def handle_frame(self, kind, seq, value, t):
+
+        if kind == protocol.SYNC:
+            self.send(protocol.SYNC_REPLY, time_stamp=t, seq=seq)
+
+        elif kind == protocol.VALVE:
+            self.n_valve += 1
+            self.send(protocol.ACK, time_stamp=t, seq=seq)
+
+        elif kind == protocol.TTL:
+            self.n_ttl += 1
+            self.send(protocol.ACK, time_stamp=t, seq=seq)
+
+        elif kind == protocol.GRIP_SUBSCRIBE:
+            self.subscribed.set()
+            self.send(protocol.GRIP_STATE, value=self.grip_state, time_stamp=t)
+
+        else:
+            log("Frame not understood: {}.".format((kind, seq, value)), self.name)
+
+    def send(self, kind, value=0, time_stamp=0, seq=None):
+
+        with self.lock:
+
+            if seq is None:
+                self.seq = (self.seq + 1) & 0xFFFFFFFF
+                seq = self.seq
+
+            self.conn.sendall(protocol.pack(kind, seq, value, time_stamp))
+
+    def set_grip(self, state):
+
+        self.grip_state = state
+        if self.subscribed.is_set():
+            self.send(protocol.GRIP_STATE, value=state, time_stamp=monotonic_ns())
+
+    def end(self):
+
+        if self.conn is not None:
+            try:
+                self.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+# --------------------------------------------------------------------------------------------------------------- #
+# ------------------------------------- MONKEY AGENT ------------------------------------------------------------ #
+# --------------------------------------------------------------------------------------------------------------- #
+
+
+class MonkeyAgent(object):
+
+    """
+    Plays the role of the interface and of the monkey: reads the instructions of the Manager
+    and reacts after random delays, choosing with a softmax on the expected values of the lotteries.
+    All the reactions are scheduled on the event loop of the Manager.
+    """
+
+    name = "MonkeyAgent"
+
+    def __init__(self, queues, n_trials, seed=0, temperature=0.5, grasp_time=(0.2, 1.),
+                 reaction_time=(0.15, 0.4), movement_time=(0.2, 0.5), return_time=(0.2, 1.),
+                 p_early_release=0.05, p_no_release=0.02):
+
+        self.queues = queues
+        self.n_trials = n_trials
+
+        self.rng = np.random.RandomState(seed)
+
+        self.temperature = temperature
+        self.grasp_time = grasp_time
+        self.reaction_time = reaction_time
+        self.movement_time = movement_time
+        self.return_time = return_time
+        self.p_early_release = p_early_release
+        self.p_no_release = p_no_release
+
+        # Set by the simulation
+        self.loop = None
+        self.set_grip = None
+        self.send = None
+
+        self.holding = False
+        self.stimuli_parameters = None
+        self.parameters = None
+        self.trial_counter = [0, 0]
+
+        self.finished = Event()
+
+        # Same interface as 'Communicant'
+        self.signal = self
+
+    def emit(self):
+
+        while not self.queues["interface"].empty():
+            self.handle_instruction(self.queues["interface"].get())
+
+    def later(self, delay, callback, *args):
+
+        self.loop.call_later(self.rng.uniform(*delay), callback, *args)
+
+    def handle_instruction(self, instruction):
+
+        command = instruction[0]
+
+        if command == "set_stimuli_parameters":
+
+            self.stimuli_parameters = instruction[1]
+
+            if not self.holding:
+                self.later(self.grasp_time, self.grasp, True)
+            else:
+                self.fixate()
+
+        elif command == "show_stimuli":
+
+            if self.rng.random_sample() >= self.p_no_release:
+                self.later(self.reaction_time, self.release_and_choose)
+
+        elif command == "show_choice":
+
+            self.later(self.return_time, self.grasp, False)
+
+        elif command == "set_trial_counter":
+
+            self.trial_counter = instruction[1]
+            if self.trial_counter[0] >= self.n_trials and not self.finished.is_set():
+                self.finished.set()
+                self.send(("game", "close"))
+
+    def grasp(self, new_trial):
+
+        if self.finished.is_set():
+            return
+
+        self.holding = True
+        self.set_grip(1)
+
+        if new_trial:
+            self.fixate()
+
+    def fixate(self):
+
+        # Release before the end of the fixation time (always shorter than the minimum fixation time)
+        if self.rng.random_sample() < self.p_early_release:
+            self.later((0, self.parameters["fixation_time"][0] / 1000), self.release)
+
+    def release(self):
+
+        self.holding = False
+        self.set_grip(0)
+
+    def release_and_choose(self):
+
+        self.release()
+        self.later(self.movement_time, self.choose)
+
+    def choose(self):
+
+        p = self.stimuli_parameters
+        expected_values = np.array([
+            p["{}_p".format(side)] * p["{}_x0".format(side)] + (1 - p["{}_p".format(side)]) * p["{}_x1".format(side)]
+            for side in ("left", "right")])
+
+        p_left = 1 / (1 + np.exp(-(expected_values[0] - expected_values[1]) / self.temperature))
+        side = "left" if self.rng.random_sample() < p_left else "right"
+
+        self.send(("game", "choice", side))
+
+
+# --------------------------------------------------------------------------------------------------------------- #
+# ------------------------------------- SIMULATION -------------------------------------------------------------- #
+# --------------------------------------------------------------------------------------------------------------- #
+
+
+def get_parameters(**kwargs):
+
+    parameters = {
+        "trials_per_block": 5, "fixation_time": [200, 300], "inter_trial_time": [500, 1000], "monkey": "Simulated",
+        "incongruent_proportion": 50, "valve_opening_time": 200, "max_return_time": 5000,
+        "result_display_time": 1500, "max_decision_time": 5000, "initial_stock": 3,
+        "control_trials_proportion": 50, "save": False, "punishment_time": 2000, "reward_time": 2500,
+        "inter_block_time": [500, 1000], "with_losses_proportion": 50, "fake": True
+    }
+    parameters.update(kwargs)
+    return parameters
+
+
+def simulate(n_trials=1000, seed=0, hardware=False, parameters=None, **agent_parameters):
+
+    """
+    :param hardware: if False, run with a virtual clock and without any connection;
+    otherwise run in real time, with a simulated Raspberry Pi
+    :return: the Manager (for inspecting its state, e.g. its trials and the lateness of its timers)
+    """
+
+    np.random.seed(seed)
+
+    parameters = get_parameters(**(parameters or {}), fake=not hardware)
+
+    queues = get_channels()
+    shutdown = Event()
+
+    agent = MonkeyAgent(queues=queues, n_trials=n_trials, seed=seed, **agent_parameters)
+    agent.parameters = parameters
+
+    if hardware:
+
+        rpi = SimulatedRaspberryPi()
+        rpi.start()
+
+        manager = Manager(communicant=agent, queues=queues, shutdown=shutdown, rpi_address=rpi.address)
+
+        agent.set_grip = rpi.set_grip
+        agent.send = queues["manager"].put
+
+    else:
+
+        rpi = None
+
+        manager = Manager(communicant=agent, queues=queues, shutdown=shutdown, virtual_clock=VirtualClock())
+
+        # Direct calls on the event loop: no thread involved, the run is deterministic
+        def set_grip(state):
+            queues["grip_value"].value = state
+            manager.grip_tracker.change((state, manager.clock()))
+
+        def send(message):
+            manager.loop.call_soon(manager.receive_message, message)
+
+        agent.set_grip = set_grip
+        agent.send = send
+
+    agent.loop = manager.loop
+
+    # Stop the event loop once the session is over (the agent acts from the event loop)
+    def close(message):
+        if message == ("game", "close"):
+            manager.loop.call_soon(finish, message)
+        else:
+            send_to_manager(message)
+
+    def finish(message):
+        shutdown.set()
+        manager.receive_message(message)
+
+    send_to_manager = agent.send
+    agent.send = close
+
+    agent.send(("interface", "run", parameters))
+    agent.send(("game", "play"))
+
+    manager.run()
+
+    if rpi is not None:
+        rpi.end()
+
+    return manager
+
+
+def main():
+
+    a = perf_counter()
+    manager = simulate(n_trials=1000)
+    b = perf_counter()
+
+    log("{} trials ({} without errors) in {:.2f} s; {:.0f} s of simulated time."
+        .format(manager.trial_counter[0], manager.trial_counter[1], b - a, manager.clock()), "Simulation")
+
+
+if __name__ == "__main__":
+
+    main()
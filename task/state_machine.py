@@ -0,0 +1,143 @@
+from collections import Counter
+
+from utils.utils import log
+
+
+"""
+Table-driven dispatch of the messages received by the Manager.
+The transition table lists, for every event (source, command), the states in which it is accepted and the handler
+to call; it is compiled into a dictionary, so that dispatching a message costs two lookups.
+Counts of events and transitions, as well as time spent in every state, are kept for monitoring.
+"""
+
+
+# Wildcard for the events accepted in every state
+ANY = "*"
+
+
+class StateMachine(object):
+
+    name = "StateMachine"
+
+    def __init__(self, states, transitions, clock, initial_state=""):
+
+        """
+        :param states: names of the states
+        :param transitions: list of (source, command, states, handler), handler being called with the message
+        :param clock: function returning the current time (s)
+        """
+
+        self.states = set(states)
+        self.transitions = transitions
+        self.clock = clock
+
+        self.validate()
+
+        # (source, command) -> {state -> handler}
+        self.table = {}
+        for source, command, states, handler in transitions:
+            self.table.setdefault((source, command), {}).update({state: handler for state in states})
+
+        self.state = initial_state
+        self.state_onset = clock()
+
+        # Event being handled
+        self.event = None
+
+        self.event_counts = Counter()
+        self.ignored_counts = Counter()
+        self.transition_counts = Counter()
+        self.time_in_state = Counter()
+
+    def validate(self):
+
+        seen = set()
+
+        for source, command, states, handler in self.transitions:
+
+            if not callable(handler):
+                raise Exception("{}: Handler of event '{}' is not callable.".format(self.name, (source, command)))
+
+            for state in states:
+
+                if state != ANY and state not in self.states:
+                    raise Exception("{}: Unknown state '{}' for event '{}'.".format(self.name, state, (source, command)))
+
+                if (source, command, state) in seen:
+                    raise Exception("{}: Event '{}' declared twice for state '{}'."
+                                    .format(self.name, (source, command), state))
+                seen.add((source, command, state))
+
+    def enter(self, state):
+
+        """ Called every time the state changes """
+
+        if state not in self.states:
+            raise Exception("{}: Unknown state '{}'.".format(self.name, state))
+
+        t = self.clock()
+        self.time_in_state[self.state] += t - self.state_onset
+        self.state_onset = t
+
+        self.transition_counts[(self.state, self.event, state)] += 1
+
+        self.state = state
+
+    def dispatch(self, message):
+
+        event = message[0], message[1]
+
+        handlers = self.table.get(event)
+        if handlers is None:
+            log("ERROR: Message not understood: '{}'.".format(message), self.name, level="error")
+            raise Exception("{}: Received message '{}' but did'nt expected anything like that."
+                            .format(self.name, message))
+
+        handler = handlers.get(self.state) or handlers.get(ANY)
+        if handler is None:
+            log("Command '{}' ignored (not in the appropriate state '{}').".format(event, self.state), self.name)
+            self.ignored_counts[(self.state, event)] += 1
+            return
+
+        log("Event '{}' in state '{}'.".format(event, self.state), self.name, level="debug")
+
+        self.event_counts[(self.state, event)] += 1
+
+        self.event = event
+        handler(message)
+        self.event = None
+
+    def report(self):
+
+        for (state, event), n in sorted(self.event_counts.items()):
+            log("State '{}', event '{}': {}.".format(state, event, n), self.name)
+
+        for (state, event), n in sorted(self.ignored_counts.items()):
+            log("State '{}', event '{}' ignored: {}.".format(state, event, n), self.name)
+
+        for state, t in sorted(self.time_in_state.items()):
+            log("Time in state '{}': {:.1f} s.".format(state, t), self.name)
+
+    def to_dot(self, observed=True):
+
+        """
+        Graph of the state machine (Graphviz format).
+        :param observed: if True, edges are the observed transitions, labelled with the event that caused them and
+        their count; otherwise, edges link every state to the events it accepts
+        """
+
+        lines = ["digraph Manager {"]
+
+        if observed:
+            for (state, event, next_state), n in sorted(self.transition_counts.items(), key=str):
+                label = "{}:{}".format(*event) if event is not None else "internal"
+                lines.append('    "{}" -> "{}" [label="{} ({})"];'.format(state, next_state, label, n))
+
+        else:
+            for (source, command), handlers in sorted(self.table.items()):
+                for state in sorted(handlers):
+                    lines.append('    "{}" -> "{}:{}" [style=dashed];'.format(state, source, command))
+
+        lines.append("}")
+
+        return "\n".join(lines)
@@ -0,0 +1,73 @@
+from collections import deque
+from threading import Condition, Lock
+from time import perf_counter_ns
+
+
+"""
+In-process message bus for the threads of the task program (Manager, Interface, transport with the RPi...).
+Messages are passed by reference: no pickling, no feeder thread and no OS pipe as with multiprocessing queues,
+which remain needed only across real process boundaries
+"""
+
+
+class Channel(object):
+
+    """
+    Unbounded FIFO queue, with the subset of the interface of 'multiprocessing.Queue' used by the task.
+    Items are stamped when put, for measuring their transit time (see 'get_stamped').
+    """
+
+    def __init__(self):
+
+        self.items = deque()
+        self.not_empty = Condition(Lock())
+
+    def put(self, item):
+
+        with self.not_empty:
+            self.items.append((item, perf_counter_ns()))
+            self.not_empty.notify()
+
+    def get(self, timeout=None):
+
+        return self.get_stamped(timeout)[0]
+
+    def get_stamped(self, timeout=None):
+
+        """ :return: item and time at which it was put (perf_counter clock, ns) """
+
+        with self.not_empty:
+
+            if not self.not_empty.wait_for(lambda: self.items, timeout=timeout):
+                raise TimeoutError("No item received in {} s.".format(timeout))
+
+            return self.items.popleft()
+
+    def empty(self):
+
+        return not self.items
+
+    def qsize(self):
+
+        return len(self.items)
+
+
+class SharedValue(object):
+
+    """ Value shared between threads (replaces 'multiprocessing.Value') """
+
+    def __init__(self, value=0):
+
+        self.value = value
+
+
+def get_channels():
+
+    """ Channels linking the threads of the task """
+
+    return {
+        "manager": Channel(),
+        "interface": Channel(),
+        "grip_queue": Channel(),
+        "grip_value": SharedValue(0)
+    }
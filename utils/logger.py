@@ -0,0 +1,165 @@
+from collections import deque
+from datetime import datetime
+from threading import Thread, Event, Lock, current_thread
+from multiprocessing import util
+import atexit
+import json
+import os
+import sys
+import time
+
+
+"""
+Asynchronous logger: 'log' only appends a record to a deque (atomic, no lock taken by the caller);
+a background writer formats the records and writes them to the console and, once configured,
+to a rotating JSON-lines file. Time-critical threads are therefore never blocked by I/O.
+"""
+
+
+levels = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+
+class Logger(object):
+
+    # Period of the writer when no record is waiting (s)
+    period = 0.05
+
+    def __init__(self, level="info", console=True):
+
+        self.level = levels[level]
+        self.console = console
+
+        self.records = deque()
+        self.wake_up = Event()
+
+        self.file_path = None
+        self.file = None
+        self.max_bytes = 10 * 1024 ** 2
+        self.backup_count = 5
+
+        self.writer = None
+        self.pid = None
+        self.start_lock = Lock()
+
+        # The writer and the exit hooks may flush at the same time
+        self.flush_lock = Lock()
+
+    def configure(self, level=None, console=None, folder=None, file_name="task.jsonl", max_bytes=None,
+                  backup_count=None):
+
+        if level is not None:
+            self.level = levels[level]
+        if console is not None:
+            self.console = console
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if backup_count is not None:
+            self.backup_count = backup_count
+
+        if folder is not None:
+            folder = os.path.expanduser(folder)
+            os.makedirs(folder, exist_ok=True)
+            self.file_path = "{}/{}".format(folder, file_name)
+
+    def log(self, msg, name, level="info"):
+
+        level = levels[level]
+        if level < self.level:
+            return
+
+        # Writer is started lazily, again in forked processes (threads are not inherited)
+        if self.pid != os.getpid():
+            self.start()
+
+        self.records.append((time.time(), level, name, msg, current_thread().name))
+
+        if level >= levels["warning"]:
+            self.wake_up.set()
+
+    def start(self):
+
+        # Several threads may log for the first time at once: only one writer is started
+        with self.start_lock:
+
+            if self.pid == os.getpid():
+                return
+
+            self.records.clear()
+
+            self.writer = Thread(target=self.run, name="LogWriter", daemon=True)
+            self.writer.start()
+
+            # Worker processes (e.g. of a 'ProcessPoolExecutor') end with 'os._exit', without running 'atexit' hooks,
+            # but with the finalizers of 'multiprocessing': write what is still waiting, last
+            util.Finalize(self, self.flush, exitpriority=-100)
+
+            self.pid = os.getpid()
+
+    def run(self):
+
+        while True:
+            self.wake_up.wait(timeout=self.period)
+            self.wake_up.clear()
+            self.flush()
+
+    def flush(self):
+
+        with self.flush_lock:
+            self.write_records()
+
+    def write_records(self):
+
+        lines = []
+        entries = []
+
+        while self.records:
+
+            t, level, name, msg, thread = self.records.popleft()
+
+            if self.console:
+                lines.append("[{}] [{}] {}\n".format(
+                    datetime.fromtimestamp(t).strftime("%Y/%m/%d %H:%M:%S:%f"), name, msg))
+
+            if self.file_path is not None:
+                entries.append(json.dumps(
+                    {"time": t, "level": level, "name": name, "msg": str(msg), "thread": thread}) + "\n")
+
+        if lines:
+            sys.stdout.write("".join(lines))
+            sys.stdout.flush()
+
+        if entries:
+            self.write("".join(entries))
+
+    def write(self, text):
+
+        if self.file is None:
+            self.file = open(self.file_path, "a")
+
+        self.file.write(text)
+        self.file.flush()
+
+        if self.file.tell() > self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+
+        self.file.close()
+        self.file = None
+
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists("{}.{}".format(self.file_path, i)):
+                os.replace("{}.{}".format(self.file_path, i), "{}.{}".format(self.file_path, i + 1))
+
+        os.replace(self.file_path, "{}.1".format(self.file_path))
+
+
+logger = Logger()
+
+# Write what is still waiting when the program exits
+atexit.register(logger.flush)
+
+# A child forked while a lock is held would never get it
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: (setattr(logger, "start_lock", Lock()),
+                                                setattr(logger, "flush_lock", Lock())))
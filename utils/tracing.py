@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter_ns
+import json
+
+from utils.utils import log
+
+
+"""
+Tracing of the latencies along the trial pipeline (grip read, queue transit, state handler, Qt signal,
+paint, sound start, valve opening...). Spans are (stage, start, end) on the perf_counter clock (ns), the one
+used for the time stamps of the task, and are kept in a fixed-size ring buffer: recording a span costs
+a couple of microseconds and memory does not grow along a session.
+"""
+
+
+class Tracer(object):
+
+    name = "Tracer"
+
+    def __init__(self, size=2**16):
+
+        self.size = size
+        self.stages = [None] * size
+        self.starts = [0] * size
+        self.ends = [0] * size
+
+        # Number of spans ever recorded
+        self.n = 0
+
+        self.lock = Lock()
+
+    @staticmethod
+    def now():
+
+        return perf_counter_ns()
+
+    def record(self, stage, start, end=None):
+
+        end = end if end is not None else perf_counter_ns()
+
+        with self.lock:
+            i = self.n % self.size
+            self.stages[i], self.starts[i], self.ends[i] = stage, start, end
+            self.n += 1
+
+    @contextmanager
+    def span(self, stage):
+
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(stage, start)
+
+    def spans(self):
+
+        """ :return: list of (stage, start, end), oldest first """
+
+        with self.lock:
+            n = min(self.n, self.size)
+            first = self.n - n
+            return [(self.stages[i % self.size], self.starts[i % self.size], self.ends[i % self.size])
+                    for i in range(first, self.n)]
+
+    def clear(self):
+
+        with self.lock:
+            self.n = 0
+
+    def summary(self):
+
+        """ :return: dictionary stage -> (number of spans, p50, p99, max), in ms """
+
+        durations = {}
+        for stage, start, end in self.spans():
+            durations.setdefault(stage, []).append((end - start) / 10**6)
+
+        summary = {}
+        for stage, x in durations.items():
+            x.sort()
+            n = len(x)
+            summary[stage] = (n, x[int(0.5 * (n - 1))], x[int(0.99 * (n - 1))], x[-1])
+
+        return summary
+
+    def report(self):
+
+        for stage, (n, p50, p99, maximum) in sorted(self.summary().items()):
+            log("'{}': n={}, p50={:.3f} ms, p99={:.3f} ms, max={:.3f} ms.".format(stage, n, p50, p99, maximum),
+                self.name)
+
+    def export(self, file_path):
+
+        """ Write the spans as JSON lines """
+
+        with open(file_path, "w") as file:
+            for stage, start, end in self.spans():
+                file.write(json.dumps({"stage": stage, "start": start, "end": end}) + "\n")
+
+        log("{} spans exported to '{}'.".format(min(self.n, self.size), file_path), self.name)
+
+
+# Shared by every thread of the task
+tracer = Tracer()
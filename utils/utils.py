@@ -1,6 +1,8 @@
 from datetime import datetime
 import git
 
+from utils.logger import logger
+
 
 def now():
 
@@ -12,9 +14,11 @@ def today():
     return datetime.now().strftime("%Y-%m-%d")
 
 
-def log(msg="", name=""):
+def log(msg="", name="", level="info"):
+
+    """ Non-blocking: the record is written by a background thread (see utils/logger.py) """
 
-    print("[{}] [{}] {}".format(now(), name, msg))
+    logger.log(msg, name, level)
 
 
 def git_report():